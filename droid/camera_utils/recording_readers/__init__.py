@@ -0,0 +1,2 @@
+# Readers Seek On Forward Jumps Longer Than This, Instead Of Grabbing Every Frame In Between #
+MAX_FRAMES_TO_GRAB = 30
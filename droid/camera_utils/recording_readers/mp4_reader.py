@@ -4,6 +4,8 @@ from copy import deepcopy
 
 import cv2
 
+from droid.camera_utils.recording_readers import MAX_FRAMES_TO_GRAB
+
 resize_func_map = {"cv2": cv2.resize, None: None}
 
 
@@ -57,8 +59,8 @@ class MP4Reader:
         if self.skip_reading:
             return
 
-        if index < self._index:
-            self._mp4_reader.set(cv2.CAP_PROP_POS_FRAMES, index - 1)
+        if (index < self._index) or (index - self._index > MAX_FRAMES_TO_GRAB):
+            self._mp4_reader.set(cv2.CAP_PROP_POS_FRAMES, index)
             self._index = index
 
         while self._index < index:
@@ -76,8 +78,11 @@ class MP4Reader:
         if self.skip_reading:
             return {}
 
-        # Read Camera #
-        success, frame = self._mp4_reader.read()
+        # Read Camera (Skipped Frames Are Grabbed Without Being Retrieved) #
+        if ignore_data:
+            success, frame = self._mp4_reader.grab(), None
+        else:
+            success, frame = self._mp4_reader.read()
         try:
             received_time = self._recording_timestamps[self._index]
         except IndexError:
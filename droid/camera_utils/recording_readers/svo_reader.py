@@ -2,6 +2,8 @@ from copy import deepcopy
 
 import cv2
 
+from droid.camera_utils.recording_readers import MAX_FRAMES_TO_GRAB
+
 try:
     import pyzed.sl as sl
 except ModuleNotFoundError:
@@ -63,6 +65,12 @@ class SVOReader:
         if self.skip_reading:
             return
 
+        # Only Compute Depth When It Is Read #
+        self._runtime = sl.RuntimeParameters()
+        self._runtime.enable_depth = depth or pointcloud
+        self._skip_runtime = sl.RuntimeParameters()
+        self._skip_runtime.enable_depth = False
+
     def get_frame_resolution(self):
         camera_info = self._cam.get_camera_information().camera_configuration
         width = camera_info.resolution.width
@@ -78,7 +86,7 @@ class SVOReader:
         if self.skip_reading:
             return
 
-        if index < self._index:
+        if (index < self._index) or (index - self._index > MAX_FRAMES_TO_GRAB):
             self._cam.set_svo_position(index)
             self._index = index
 
@@ -96,9 +104,9 @@ class SVOReader:
         if self.skip_reading:
             return {}
 
-        # Read Camera #
+        # Read Camera (Skipped Frames Are Grabbed Without Depth, And Never Retrieved) #
         self._index += 1
-        err = self._cam.grab()
+        err = self._cam.grab(self._skip_runtime if ignore_data else self._runtime)
         if err != sl.ERROR_CODE.SUCCESS:
             return None
         if ignore_data:
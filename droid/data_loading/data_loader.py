@@ -1,7 +1,7 @@
 from torch.utils.data import DataLoader
 from torch.utils.data.datapipes.iter import Shuffler
 
-from droid.data_loading.dataset import TrajectoryDataset
+from droid.data_loading.dataset import ColumnarShuffler, TrajectoryDataset
 from droid.data_loading.trajectory_sampler import *
 
 
@@ -13,6 +13,8 @@ def create_dataloader(
     buffer_size=1000,
     prefetch_factor=2,
     traj_loading_kwargs={},
+    traj_sampling_kwargs={},
+    window_kwargs=None,
     timestep_filtering_kwargs={},
     camera_kwargs={},
     image_transform_kwargs={},
@@ -24,9 +26,14 @@ def create_dataloader(
         timestep_filtering_kwargs=timestep_filtering_kwargs,
         image_transform_kwargs=image_transform_kwargs,
         camera_kwargs=camera_kwargs,
+        **traj_sampling_kwargs,
     )
-    dataset = TrajectoryDataset(traj_sampler)
-    shuffled_dataset = Shuffler(dataset, buffer_size=buffer_size)
+    dataset = TrajectoryDataset(traj_sampler, window_kwargs=window_kwargs)
+    # Structured Trajectories Are Also Buffered As Arrays, Rather Than As A Dictionary Per Sample #
+    if traj_loading_kwargs.get("structured", False):
+        shuffled_dataset = ColumnarShuffler(dataset, buffer_size=buffer_size)
+    else:
+        shuffled_dataset = Shuffler(dataset, buffer_size=buffer_size)
     dataloader = DataLoader(
         shuffled_dataset, batch_size=batch_size, num_workers=num_workers, prefetch_factor=prefetch_factor
     )
@@ -34,6 +41,15 @@ def create_dataloader(
     return dataloader
 
 
+def set_dataloader_epoch(dataloader, epoch):
+    """Sets the epoch the trajectory samplers of every worker count from, the next time the dataloader is iterated."""
+    shuffled_dataset = dataloader.dataset
+    if isinstance(shuffled_dataset, ColumnarShuffler):
+        shuffled_dataset.dataset.set_epoch(epoch)
+    else:
+        shuffled_dataset.datapipe.set_epoch(epoch)
+
+
 def create_train_test_data_loader(data_loader_kwargs={}, data_processing_kwargs={}, camera_kwargs={}):
     # Generate Train / Test Split #
     data_filtering_kwargs = data_loader_kwargs.pop("data_filtering_kwargs", {})
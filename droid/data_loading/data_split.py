@@ -0,0 +1,137 @@
+import json
+import os
+from itertools import compress
+
+import numpy as np
+
+
+def get_stratum_key(episode, stratify_by):
+    """
+    Returns the stratum of a cataloged episode (see TrajectoryCatalog.query). stratify_by is an attribute name (e.g.
+    "building", "scene_id" or "current_task"), a list of them, or a function of the episode (e.g. mapping its user to
+    a lab). Names missing from the attributes are looked up on the episode itself (e.g. "success").
+    """
+    if callable(stratify_by):
+        return stratify_by(episode)
+    if isinstance(stratify_by, str):
+        return episode["attrs"][stratify_by] if (stratify_by in episode["attrs"]) else episode.get(stratify_by)
+    return [get_stratum_key(episode, key) for key in stratify_by]
+
+
+def get_strata(episodes, stratify_by=None):
+    """Returns an integer stratum label per episode, numbered in order of first appearance."""
+    strata = np.zeros(len(episodes), dtype=np.int64)
+    if stratify_by is None:
+        return strata
+
+    labels = {}
+    for i, episode in enumerate(episodes):
+        key = get_stratum_key(episode, stratify_by)
+        key = json.dumps(key, sort_keys=True) if isinstance(key, (list, dict)) else key
+        strata[i] = labels.setdefault(key, len(labels))
+    return strata
+
+
+def get_train_counts(counts, train_p, rng):
+    """
+    Returns how many episodes of each stratum go to training. round(train_p * N) episodes are trained on in total
+    (leaving at least one episode on each side if there are several, and 0 < train_p < 1), and are shared out between
+    strata by largest remainder, so strata too small to split on their own still add up to a test set. Ties between
+    equal remainders are broken at random.
+    """
+    num_episodes = int(counts.sum())
+    total_train = int(np.floor(train_p * num_episodes + 0.5))
+    if num_episodes > 1:
+        if 0 < train_p:
+            total_train = max(total_train, 1)
+        if train_p < 1:
+            total_train = min(total_train, num_episodes - 1)
+
+    # Give Each Stratum Its Whole Share, Then Hand Out The Rest By Largest Remainder #
+    exact_train = train_p * counts
+    num_train = np.minimum(np.floor(exact_train).astype(np.int64), counts)
+    remainders = exact_train - num_train
+    num_left = total_train - int(num_train.sum())
+    if num_left > 0:
+        priority = np.lexsort((rng.random(len(counts)), -remainders))
+        priority = priority[num_train[priority] < counts[priority]]
+        num_train[priority[:num_left]] += 1
+    elif num_left < 0:
+        priority = np.lexsort((rng.random(len(counts)), remainders))
+        priority = priority[num_train[priority] > 0]
+        num_train[priority[:-num_left]] -= 1
+
+    return num_train
+
+
+def split_episodes(episodes, train_p=0.9, stratify_by=None, seed=0):
+    """
+    Returns a boolean mask of the episodes assigned to training, so that train_p of the episodes are trained on and
+    each stratum is split as close to train_p / 1 - train_p as whole episodes allow (see get_train_counts). Episodes
+    are shuffled by a generator seeded with seed, so the same episodes, in the same order, always get the same split.
+    """
+    num_episodes = len(episodes)
+    strata = get_strata(episodes, stratify_by=stratify_by)
+    rng = np.random.default_rng(seed)
+
+    # Shuffle, Then Group By Stratum (A Stable Sort Keeps Each Stratum Shuffled) #
+    order = rng.permutation(num_episodes)
+    order = order[np.argsort(strata[order], kind="stable")]
+    sorted_strata = strata[order]
+
+    # Take The First Episodes Of Each Stratum #
+    counts = np.bincount(strata, minlength=1)
+    starts = np.cumsum(counts) - counts
+    num_train = get_train_counts(counts, train_p, rng)
+    rank_in_stratum = np.arange(num_episodes) - starts[sorted_strata]
+
+    train_mask = np.zeros(num_episodes, dtype=bool)
+    train_mask[order] = rank_in_stratum < num_train[sorted_strata]
+    if (train_p < 1) and (num_episodes > 1):
+        assert not train_mask.all(), "The split left no episodes to test on"
+    return train_mask
+
+
+def apply_split(folderpaths, train_mask):
+    test_mask = ~np.asarray(train_mask, dtype=bool)
+    return list(compress(folderpaths, train_mask)), list(compress(folderpaths, test_mask))
+
+
+def save_split_manifest(manifest_path, train_folderpaths, test_folderpaths, split_kwargs={}):
+    """Saves a train / test split (and the settings that made it) as JSON, so later runs can reuse it exactly."""
+    manifest_dir = os.path.dirname(manifest_path)
+    if manifest_dir:
+        os.makedirs(manifest_dir, exist_ok=True)
+    manifest = {"split_kwargs": split_kwargs, "train": list(train_folderpaths), "test": list(test_folderpaths)}
+
+    temp_filepath = "{0}.{1}.tmp".format(manifest_path, os.getpid())
+    with open(temp_filepath, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    os.replace(temp_filepath, manifest_path)
+
+
+def get_split_kwargs(**split_kwargs):
+    """
+    Returns the settings that made a split in the form a manifest stores them. Functions (e.g. filter_func, or a
+    callable stratify_by) are recorded by name, and tuples become lists, so settings compare equal to a loaded manifest.
+    """
+    split_kwargs = {
+        key: "{0}.{1}".format(value.__module__, value.__qualname__) if callable(value) else value
+        for key, value in split_kwargs.items()
+    }
+    return json.loads(json.dumps(split_kwargs))
+
+
+def load_split_manifest(manifest_path, split_kwargs=None):
+    """Loads a saved train / test split. If split_kwargs is given, it must match the settings the split was made with."""
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+
+    saved_kwargs = manifest.get("split_kwargs", {})
+    if (split_kwargs is not None) and (saved_kwargs != split_kwargs):
+        raise ValueError(
+            "The split saved in {0} was made with {1}, not {2}. Pass overwrite_manifest=True to split again.".format(
+                manifest_path, saved_kwargs, split_kwargs
+            )
+        )
+    return manifest["train"], manifest["test"]
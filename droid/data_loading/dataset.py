@@ -1,14 +1,26 @@
+import random
+from collections.abc import Mapping
+
+import numpy as np
 import torch
 from torch.utils.data import IterableDataset
 
 
 class TrajectoryDataset(IterableDataset):
-    def __init__(self, trajectory_sampler):
+    def __init__(self, trajectory_sampler, window_kwargs=None):
+        """If window_kwargs are given, windows from TrajectorySampler.fetch_windows are yielded instead of timesteps."""
         self._trajectory_sampler = trajectory_sampler
+        self._window_kwargs = window_kwargs
+
+    def set_epoch(self, epoch):
+        self._trajectory_sampler.set_epoch(epoch)
 
     def _refresh_generator(self):
         worker_info = torch.utils.data.get_worker_info()
-        new_samples = self._trajectory_sampler.fetch_samples(worker_info=worker_info)
+        if self._window_kwargs is None:
+            new_samples = self._trajectory_sampler.fetch_samples(worker_info=worker_info)
+        else:
+            new_samples = self._trajectory_sampler.fetch_windows(**self._window_kwargs, worker_info=worker_info)
         self._sample_generator = iter(new_samples)
 
     def __iter__(self):
@@ -18,3 +30,80 @@ class TrajectoryDataset(IterableDataset):
                 yield next(self._sample_generator)
             except StopIteration:
                 self._refresh_generator()
+                continue
+
+
+def get_sample_layout(sample, path=()):
+    """Returns the nesting of a sample (dictionaries and lists), with each array replaced by its path."""
+    if isinstance(sample, Mapping):
+        return {key: get_sample_layout(value, (*path, key)) for key, value in sample.items()}
+    if isinstance(sample, (list, tuple)):
+        return [get_sample_layout(value, (*path, i)) for i, value in enumerate(sample)]
+    return path
+
+
+def flatten_sample(sample, path=(), arrays=None):
+    """Returns every array of a sample as an array, keyed by its path (see get_sample_layout)."""
+    arrays = {} if (arrays is None) else arrays
+    if isinstance(sample, Mapping):
+        for key, value in sample.items():
+            flatten_sample(value, (*path, key), arrays)
+    elif isinstance(sample, (list, tuple)):
+        for i, value in enumerate(sample):
+            flatten_sample(value, (*path, i), arrays)
+    else:
+        arrays[path] = np.asarray(sample)
+    return arrays
+
+
+def build_sample(layout, columns, index):
+    """Rebuilds the sample stored in row index of the columns, copying its arrays out of them."""
+    if isinstance(layout, dict):
+        return {key: build_sample(value, columns, index) for key, value in layout.items()}
+    if isinstance(layout, list):
+        return [build_sample(value, columns, index) for value in layout]
+    return columns[layout][index].copy()
+
+
+class ColumnarShuffler(IterableDataset):
+    """
+    Shuffle buffer like torch's Shuffler, except buffered samples are kept as rows of one preallocated array per path
+    (e.g. one per camera image), rather than as a nested dictionary of arrays each. Every sample must have the layout
+    and array shapes of the first.
+    """
+
+    def __init__(self, dataset, buffer_size=1000):
+        self.dataset = dataset
+        self.buffer_size = buffer_size
+
+    def __iter__(self):
+        layout, columns, num_buffered = None, None, 0
+
+        for sample in self.dataset:
+            arrays = flatten_sample(sample)
+
+            # Allocate Columns From The First Sample #
+            if columns is None:
+                layout = get_sample_layout(sample)
+                columns = {
+                    path: np.empty((self.buffer_size, *array.shape), dtype=array.dtype) for path, array in arrays.items()
+                }
+            mismatched_paths = set(arrays).symmetric_difference(columns) or [
+                path for path, array in arrays.items() if array.shape != columns[path].shape[1:]
+            ]
+            if mismatched_paths:
+                raise ValueError("Sample layout differs from the buffered samples at {0}".format(mismatched_paths))
+
+            # Fill The Buffer, Then Replace A Random Sample With Each New One #
+            if num_buffered < self.buffer_size:
+                index = num_buffered
+                num_buffered += 1
+            else:
+                index = random.randrange(self.buffer_size)
+                yield build_sample(layout, columns, index)
+            for path, array in arrays.items():
+                columns[path][index] = array
+
+        # Empty The Buffer Once The Dataset Ends #
+        for index in random.sample(range(num_buffered), num_buffered):
+            yield build_sample(layout, columns, index)
@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+import time
+
+import h5py
+
+from droid.misc.json_utils import get_json_compatible
+from droid.trajectory_utils.trajectory_reader import build_dataset_index, get_index_length, read_trajectory_attrs
+
+CATALOG_FILENAME = "catalog.sqlite"
+TRAJECTORY_FILENAME = "trajectory.h5"
+
+# Episodes Written Between Commits While Updating, So An Interrupted Update Keeps Its Progress #
+UPDATE_BATCH_SIZE = 1000
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trajectories (
+    folderpath TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    file_size INTEGER NOT NULL,
+    length INTEGER,
+    success INTEGER NOT NULL,
+    camera_serials TEXT NOT NULL,
+    attrs TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS updates (
+    data_dir TEXT PRIMARY KEY,
+    update_time REAL NOT NULL
+);
+"""
+
+
+def read_trajectory_info(filepath):
+    """Reads what the catalog records about a trajectory file: its length, attributes, and camera serial numbers."""
+    with h5py.File(filepath, "r") as hdf5_file:
+        attrs = json.loads(json.dumps(read_trajectory_attrs(hdf5_file), default=get_json_compatible))
+        camera_type_group = hdf5_file.get("observation/camera_type")
+        camera_serials = sorted(camera_type_group.keys()) if isinstance(camera_type_group, h5py.Group) else []
+        length = get_index_length(build_dataset_index(hdf5_file))
+    return {"length": length, "attrs": attrs, "camera_serials": camera_serials}
+
+
+def find_trajectory_files(data_dir):
+    """
+    Yields (folderpath, os.stat_result) for every episode folder under data_dir, meaning a folder that holds a
+    trajectory file. Like crawler, folders inside an episode folder are not searched.
+    """
+    dirnames = [data_dir]
+    while dirnames:
+        dirname = dirnames.pop()
+        try:
+            entries = list(os.scandir(dirname))
+        except OSError:
+            continue
+
+        traj_entry = next((e for e in entries if (e.name == TRAJECTORY_FILENAME) and e.is_file()), None)
+        if traj_entry is not None:
+            yield dirname, traj_entry.stat()
+            continue
+
+        dirnames.extend(sorted([e.path for e in entries if e.is_dir()], reverse=True))
+
+
+def get_tree_mtime(data_dir, depth=2):
+    """
+    Returns the latest mtime (in seconds) of the folders up to depth levels below data_dir. Adding, moving or removing
+    an episode folder changes the mtime of its parent, so for the <data_dir>/success/<date>/<episode> layout a depth of
+    2 notices new episodes without visiting any episode folder. The mtime of data_dir itself is left out, since it
+    changes whenever a catalog kept there is written (a new folder directly in data_dir has a new mtime of its own).
+    """
+    latest_mtime, dirnames = 0.0, [(data_dir, 0)]
+    while dirnames:
+        dirname, level = dirnames.pop()
+        if level == depth:
+            continue
+        try:
+            entries = [e for e in os.scandir(dirname) if e.is_dir()]
+        except OSError:
+            continue
+        for entry in entries:
+            latest_mtime = max(latest_mtime, entry.stat().st_mtime)
+            dirnames.append((entry.path, level + 1))
+    return latest_mtime
+
+
+class TrajectoryCatalog:
+    """
+    Persistent SQLite index of the episodes in a data tree, recording each episode's folderpath, trajectory length,
+    success flag, camera serial numbers, HDF5 attributes (as JSON) and the size and mtime of its trajectory file.
+    Queries never touch the data tree. update brings the catalog in line with the tree, and only opens trajectory
+    files that are new or whose size or mtime changed since they were last cataloged.
+    """
+
+    def __init__(self, catalog_path):
+        self.catalog_path = catalog_path
+        self._connection = sqlite3.connect(catalog_path)
+        with self._connection:
+            self._connection.executescript(CATALOG_SCHEMA)
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM trajectories").fetchone()[0]
+
+    def update(self, data_dir):
+        """Catalogs new and changed episodes under data_dir, and drops deleted ones. Returns the two counts."""
+        data_dir = os.path.abspath(data_dir)
+        prefix = os.path.join(data_dir, "")
+        update_time = time.time()
+
+        # Load What Was Cataloged Under This Directory #
+        file_keys = {
+            folderpath: (mtime_ns, file_size)
+            for folderpath, mtime_ns, file_size in self._connection.execute(
+                "SELECT folderpath, mtime_ns, file_size FROM trajectories"
+            )
+            if folderpath.startswith(prefix)
+        }
+
+        # Re-Read Episodes Whose Trajectory File Changed #
+        rows, seen_folderpaths, num_updated = [], set(), 0
+        for folderpath, file_stat in find_trajectory_files(data_dir):
+            seen_folderpaths.add(folderpath)
+            if file_keys.get(folderpath) == (file_stat.st_mtime_ns, file_stat.st_size):
+                continue
+
+            try:
+                traj_info = read_trajectory_info(os.path.join(folderpath, TRAJECTORY_FILENAME))
+            except (OSError, KeyError, AssertionError) as e:
+                print("WARNING: Skipping {0}, which could not be read ({1})".format(folderpath, e))
+                continue
+
+            success = traj_info["attrs"].get("success", (os.sep + "success" + os.sep) in folderpath)
+            rows.append(
+                (
+                    folderpath,
+                    file_stat.st_mtime_ns,
+                    file_stat.st_size,
+                    traj_info["length"],
+                    int(bool(success)),
+                    json.dumps(traj_info["camera_serials"]),
+                    json.dumps(traj_info["attrs"]),
+                )
+            )
+            if len(rows) >= UPDATE_BATCH_SIZE:
+                num_updated += self._write_rows(rows)
+                rows = []
+        num_updated += self._write_rows(rows)
+
+        # Drop Episodes That No Longer Exist #
+        removed_folderpaths = [(f,) for f in file_keys if f not in seen_folderpaths]
+        with self._connection:
+            self._connection.executemany("DELETE FROM trajectories WHERE folderpath = ?", removed_folderpaths)
+            self._connection.execute("INSERT OR REPLACE INTO updates VALUES (?, ?)", (data_dir, update_time))
+
+        return num_updated, len(removed_folderpaths)
+
+    def get_update_time(self, data_dir):
+        """Returns when the last update of data_dir started (in seconds since the epoch), or None if it never was."""
+        row = self._connection.execute(
+            "SELECT update_time FROM updates WHERE data_dir = ?", (os.path.abspath(data_dir),)
+        ).fetchone()
+        return None if (row is None) else row[0]
+
+    def _write_rows(self, rows):
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO trajectories VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def query(self, data_dir=None, success=None, min_length=None, filter_func=None):
+        """
+        Returns cataloged episodes as dictionaries, sorted by folderpath. Episodes can be limited to those under
+        data_dir, with the given success flag, or with at least min_length timesteps. If filter_func is given, it is
+        called with each episode's attributes (like crawler) and only episodes it returns True for are kept.
+        """
+        conditions, parameters = [], []
+        if success is not None:
+            conditions.append("success = ?")
+            parameters.append(int(success))
+        if min_length is not None:
+            conditions.append("length >= ?")
+            parameters.append(min_length)
+        where_clause = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        cursor = self._connection.execute(
+            "SELECT folderpath, mtime_ns, file_size, length, success, camera_serials, attrs FROM trajectories"
+            + where_clause
+            + " ORDER BY folderpath",
+            parameters,
+        )
+
+        prefix = None if (data_dir is None) else os.path.join(os.path.abspath(data_dir), "")
+        episodes = []
+        for folderpath, mtime_ns, file_size, length, success, camera_serials, attrs in cursor:
+            if (prefix is not None) and (not folderpath.startswith(prefix)):
+                continue
+            attrs = json.loads(attrs)
+            if (filter_func is not None) and (not filter_func(attrs)):
+                continue
+            episodes.append(
+                {
+                    "folderpath": folderpath,
+                    "mtime_ns": mtime_ns,
+                    "file_size": file_size,
+                    "length": length,
+                    "success": bool(success),
+                    "camera_serials": json.loads(camera_serials),
+                    "attrs": attrs,
+                }
+            )
+        return episodes
+
+    def get_lengths(self, folderpaths):
+        """Returns the cataloged length of each folderpath, or None for folderpaths that aren't cataloged."""
+        lengths = dict(self._connection.execute("SELECT folderpath, length FROM trajectories"))
+        return [lengths.get(os.path.abspath(folderpath)) for folderpath in folderpaths]
+
+    def get_folderpaths(self, **query_kwargs):
+        return [episode["folderpath"] for episode in self.query(**query_kwargs)]
+
+    def close(self):
+        self._connection.close()
@@ -1,15 +1,25 @@
 import os
+import time
 
 import h5py
 import numpy as np
 
+from droid.data_loading.data_split import (
+    apply_split,
+    get_split_kwargs,
+    load_split_manifest,
+    save_split_manifest,
+    split_episodes,
+)
+from droid.data_loading.trajectory_catalog import CATALOG_FILENAME, TrajectoryCatalog, get_tree_mtime
 from droid.data_processing.timestep_processing import TimestepProcesser
 from droid.trajectory_utils.misc import load_trajectory
+from droid.trajectory_utils.trajectory_reader import TrajectoryReader, read_trajectory_attrs
 
 
 def crawler(dirname, filter_func=None):
     subfolders = [f.path for f in os.scandir(dirname) if f.is_dir()]
-    traj_files = [f.path for f in os.scandir(dirname) if (f.is_file() and "trajectory.h5" in f.path)]
+    traj_files = [f.path for f in os.scandir(dirname) if (f.is_file() and (f.name == "trajectory.h5"))]
 
     if len(traj_files):
         # Only Save Desired Data #
@@ -17,7 +27,7 @@ def crawler(dirname, filter_func=None):
             use_data = True
         else:
             hdf5_file = h5py.File(traj_files[0], "r")
-            use_data = filter_func(hdf5_file.attrs)
+            use_data = filter_func(read_trajectory_attrs(hdf5_file))
             hdf5_file.close()
 
         if use_data:
@@ -31,38 +41,144 @@ def crawler(dirname, filter_func=None):
     return all_folderpaths
 
 
-def generate_train_test_split(filter_func=None, remove_failures=True, train_p=0.9):
-    # Collect And Split #
-    all_folderpaths = collect_data_folderpaths(filter_func=filter_func, remove_failures=remove_failures)
+def generate_train_test_split(
+    filter_func=None,
+    remove_failures=True,
+    train_p=0.9,
+    catalog_path=None,
+    update_catalog=None,
+    stratify_by=None,
+    seed=0,
+    manifest_path=None,
+    overwrite_manifest=False,
+):
+    """
+    Splits cataloged episodes so each stratum (see get_stratum_key, e.g. stratify_by="building") is divided train_p /
+    1 - train_p, using a generator seeded with seed. If manifest_path is given, the split is saved there, and later
+    calls with the same manifest_path load it instead of splitting again, so every experiment trains on the same data.
+    Loading a manifest made with different settings raises a ValueError, unless overwrite_manifest is True, in which
+    case the episodes are split again and the manifest is replaced.
+    """
+    split_kwargs = get_split_kwargs(
+        filter_func=filter_func, remove_failures=remove_failures, train_p=train_p, stratify_by=stratify_by, seed=seed
+    )
+
+    # Reuse A Saved Split #
+    if (manifest_path is not None) and os.path.isfile(manifest_path) and (not overwrite_manifest):
+        return load_split_manifest(manifest_path, split_kwargs=split_kwargs)
 
-    # Split Into Train / Test #
-    num_train_traj = int(train_p * len(all_folderpaths))
-    all_ind = np.random.permutation(len(all_folderpaths))
-    training_ind, test_ind = all_ind[:num_train_traj], all_ind[num_train_traj:]
-    train_folderpaths, test_folderpaths = [], []
+    # Collect And Split #
+    episodes = collect_data_episodes(
+        filter_func=filter_func,
+        remove_failures=remove_failures,
+        catalog_path=catalog_path,
+        update_catalog=update_catalog,
+    )
+    train_mask = split_episodes(episodes, train_p=train_p, stratify_by=stratify_by, seed=seed)
+    train_folderpaths, test_folderpaths = apply_split([e["folderpath"] for e in episodes], train_mask)
 
-    for i in range(len(all_folderpaths)):
-        folderpath = all_folderpaths[i]
-        if i in training_ind:
-            train_folderpaths.append(folderpath)
-        if i in test_ind:
-            test_folderpaths.append(folderpath)
+    # Save Split #
+    if manifest_path is not None:
+        save_split_manifest(manifest_path, train_folderpaths, test_folderpaths, split_kwargs=split_kwargs)
 
     return train_folderpaths, test_folderpaths
 
 
-def collect_data_folderpaths(filter_func=None, remove_failures=True):
-    # Prepare Data Folder #
+def get_data_dir():
     dir_path = os.path.dirname(os.path.realpath(__file__))
-    data_dir = os.path.join(dir_path, "../../data")
-    if remove_failures:
-        data_dir = os.path.join(data_dir, "success")
+    return os.path.abspath(os.path.join(dir_path, "../../data"))
+
+
+def collect_data_episodes(filter_func=None, remove_failures=True, catalog_path=None, update_catalog=None):
+    """
+    Episodes are listed from a TrajectoryCatalog (by default, data/catalog.sqlite) instead of crawling the data tree.
+    By default the catalog is updated whenever the data folders changed since its last update, which only re-reads
+    trajectory files that are new or changed. update_catalog=True always updates it, and update_catalog=False never
+    does (new episodes are then left out, with a warning).
+    """
+    # Open Catalog #
+    data_dir = get_data_dir()
+    if catalog_path is None:
+        catalog_path = os.path.join(data_dir, CATALOG_FILENAME)
+    catalog = TrajectoryCatalog(catalog_path)
+    update_time = catalog.get_update_time(data_dir)
+
+    # Update Catalog If It Is Stale #
+    is_stale = (update_time is None) or (get_tree_mtime(data_dir) > update_time)
+    if update_catalog or ((update_catalog is None) and is_stale):
+        catalog.update(data_dir)
+    elif is_stale:
+        print(
+            "WARNING: {0} has changed since the trajectory catalog was last updated ({1}). Changes are left out"
+            " while update_catalog=False.".format(
+                data_dir, "never" if (update_time is None) else time.ctime(update_time)
+            )
+        )
 
     # Collect #
-    all_folderpaths = crawler(data_dir, filter_func=filter_func)
+    episodes = catalog.query(data_dir=data_dir, success=True if remove_failures else None, filter_func=filter_func)
+    catalog.close()
+
+    return episodes
+
+
+def collect_data_folderpaths(filter_func=None, remove_failures=True, catalog_path=None, update_catalog=None):
+    episodes = collect_data_episodes(
+        filter_func=filter_func,
+        remove_failures=remove_failures,
+        catalog_path=catalog_path,
+        update_catalog=update_catalog,
+    )
+    return [episode["folderpath"] for episode in episodes]
 
-    # Return Paths #
-    return all_folderpaths
+
+def get_trajectory_lengths(folderpaths, catalog_path=None):
+    """
+    Looks up the length of each trajectory in the catalog (by default data/catalog.sqlite, if it exists), and reads
+    the length of any trajectory that isn't cataloged from its trajectory file.
+    """
+    if catalog_path is None:
+        catalog_path = os.path.join(get_data_dir(), CATALOG_FILENAME)
+
+    traj_lengths = [None] * len(folderpaths)
+    if os.path.isfile(catalog_path):
+        catalog = TrajectoryCatalog(catalog_path)
+        traj_lengths = catalog.get_lengths(folderpaths)
+        catalog.close()
+
+    for i, folderpath in enumerate(folderpaths):
+        if traj_lengths[i] is None:
+            traj_reader = TrajectoryReader(os.path.join(folderpath, "trajectory.h5"), read_images=False)
+            traj_lengths[i] = traj_reader.length() or 0
+            traj_reader.close()
+
+    return np.array(traj_lengths, dtype=np.int64)
+
+
+def get_distributed_info():
+    """Returns the (rank, world size) of this process, as set by torchrun, or (0, 1) outside distributed training."""
+    return int(os.environ.get("RANK", 0)), int(os.environ.get("WORLD_SIZE", 1))
+
+
+def get_shard_indices(num_trajs, shard_id, num_shards, seed=0, epoch=0, cumulative_weights=None):
+    """
+    Draws the trajectories of an epoch from seed (the same in every worker of every rank), deals them into num_shards
+    interleaved shards (whose sizes differ by at most one), and returns shard shard_id. Without weights the draws are a
+    permutation of range(num_trajs), so the shards cover every trajectory once. Otherwise num_trajs trajectories are
+    drawn by weight before sharding, so together the shards follow the weights. If there are fewer trajectories than
+    shards, each empty shard borrows one trajectory instead.
+    """
+    rng = np.random.default_rng([seed, epoch])
+    if cumulative_weights is None:
+        epoch_indices = rng.permutation(num_trajs)
+    else:
+        draws = rng.uniform(0, cumulative_weights[-1], size=num_trajs)
+        epoch_indices = np.minimum(np.searchsorted(cumulative_weights, draws, side="right"), num_trajs - 1)
+
+    shard_indices = epoch_indices[shard_id::num_shards]
+    if (len(shard_indices) == 0) and (num_trajs > 0):
+        shard_indices = epoch_indices[[shard_id % num_trajs]]
+    return shard_indices
 
 
 class TrajectorySampler:
@@ -70,11 +186,22 @@ class TrajectorySampler:
         self,
         all_folderpaths,
         recording_prefix="",
-        traj_loading_kwargs={},
+        traj_loading_kwargs={},  # Passed on to load_trajectory
         timestep_filtering_kwargs={},
         image_transform_kwargs={},
         camera_kwargs={},
+        sample_weighting="trajectory",  # Or "timestep", to draw trajectories in proportion to their length
+        traj_weights=None,  # Drawn in proportion to these with sample_weighting="trajectory", or uniformly if None
+        traj_lengths=None,  # Looked up with get_trajectory_lengths if None
+        window_size=None,  # Reads a window of this many timesteps per fetch, rather than the whole trajectory
+        catalog_path=None,
+        seed=0,
+        rank=None,  # Taken from get_distributed_info if None
+        world_size=None,
     ):
+        """Draws trajectories each epoch, sharded across every DataLoader worker of every rank (see set_epoch)."""
+        assert sample_weighting in ["trajectory", "timestep"]
+        assert (traj_weights is None) or (len(traj_weights) == len(all_folderpaths))
         self._all_folderpaths = all_folderpaths
         self.recording_prefix = recording_prefix
         self.traj_loading_kwargs = traj_loading_kwargs
@@ -82,16 +209,92 @@ class TrajectorySampler:
             **timestep_filtering_kwargs, image_transform_kwargs=image_transform_kwargs
         )
         self.camera_kwargs = camera_kwargs
+        self.sample_weighting = sample_weighting
+        self.traj_weights = traj_weights
+        self.window_size = window_size
+        self._catalog_path = catalog_path
+        self._traj_lengths = None if (traj_lengths is None) else np.asarray(traj_lengths, dtype=np.int64)
+        self._cumulative_weights = None
 
-    def fetch_samples(self, worker_info=None):
-        if worker_info is None:
-            range_low, range_high = 0, len(self._all_folderpaths)
-        else:
-            slice_size = len(self._all_folderpaths) // worker_info.num_workers
-            range_low = slice_size * worker_info.id
-            range_high = slice_size * (worker_info.id + 1)
+        # Sharding #
+        distributed_info = get_distributed_info()
+        self.seed = seed
+        self.rank = distributed_info[0] if (rank is None) else rank
+        self.world_size = distributed_info[1] if (world_size is None) else world_size
+        self.epoch = 0
+        self._shard_key = None
+        self._shard_indices = None
+        self._num_fetches = 0
 
-        traj_ind = np.random.randint(low=range_low, high=range_high)
+    def get_traj_lengths(self):
+        if self._traj_lengths is None:
+            self._traj_lengths = get_trajectory_lengths(self._all_folderpaths, catalog_path=self._catalog_path)
+        return self._traj_lengths
+
+    def _uses_uniform_weights(self):
+        return (self.sample_weighting == "trajectory") and (self.traj_weights is None)
+
+    def _get_cumulative_weights(self):
+        if self._cumulative_weights is None:
+            if self.sample_weighting == "timestep":
+                weights = self.get_traj_lengths()
+            else:
+                weights = self.traj_weights
+            self._cumulative_weights = np.cumsum(np.asarray(weights, dtype=np.float64))
+            assert self._cumulative_weights[-1] > 0, "Every trajectory has zero weight"
+        return self._cumulative_weights
+
+    def set_epoch(self, epoch):
+        """
+        Sets the epoch to count from. Call it before iterating a DataLoader, which hands workers a copy of the sampler
+        (persistent_workers=False), so that every worker starts from the same epoch.
+        """
+        self.epoch = epoch
+        self._shard_key = None
+        self._num_fetches = 0
+
+    def _update_shard(self, worker_info):
+        num_workers, worker_id = (1, 0) if (worker_info is None) else (worker_info.num_workers, worker_info.id)
+        shard_id = self.rank * num_workers + worker_id
+        num_shards = self.world_size * num_workers
+
+        # Every Worker Moves On To The Next Epoch After The Same Number Of Fetches #
+        num_trajs = len(self._all_folderpaths)
+        epoch_length = -(-num_trajs // num_shards)
+        epoch = self.epoch + self._num_fetches // epoch_length
+        shard_key = (shard_id, num_shards, epoch)
+        if shard_key == self._shard_key:
+            return
+
+        cumulative_weights = None if self._uses_uniform_weights() else self._get_cumulative_weights()
+        self._shard_indices = get_shard_indices(
+            num_trajs, shard_id, num_shards, seed=self.seed, epoch=epoch, cumulative_weights=cumulative_weights
+        )
+        self._shard_key = shard_key
+
+    def _sample_trajectory(self, worker_info=None):
+        """Returns the next trajectory index of this worker's shard."""
+        self._update_shard(worker_info)
+        shard_ind = self._num_fetches % len(self._shard_indices)
+        self._num_fetches += 1
+        return int(self._shard_indices[shard_ind])
+
+    def _get_window_kwargs(self, traj_ind):
+        """Returns the start and end of the window holding a uniformly drawn timestep, within the requested range."""
+        stride = self.traj_loading_kwargs.get("stride", 1)
+        range_start = self.traj_loading_kwargs.get("start", 0)
+        range_end = int(self.get_traj_lengths()[traj_ind])
+        if self.traj_loading_kwargs.get("end") is not None:
+            range_end = min(range_end, self.traj_loading_kwargs["end"])
+
+        # Split The Requested Range Into Windows, And Read The One Holding The Drawn Timestep #
+        window_span = self.window_size * stride
+        num_strided_steps = -(-(range_end - range_start) // stride)
+        window_ind = np.random.randint(max(num_strided_steps, 1)) // self.window_size
+        start = range_start + window_ind * window_span
+        return {"start": start, "end": min(start + window_span, range_end)}
+
+    def _load_trajectory(self, traj_ind, traj_loading_kwargs):
         folderpath = self._all_folderpaths[traj_ind]
 
         filepath = os.path.join(folderpath, "trajectory.h5")
@@ -99,13 +302,59 @@ class TrajectorySampler:
         if not os.path.exists(recording_folderpath):
             recording_folderpath = None
 
-        traj_samples = load_trajectory(
+        return load_trajectory(
             filepath,
             recording_folderpath=recording_folderpath,
             camera_kwargs=self.camera_kwargs,
-            **self.traj_loading_kwargs,
+            **traj_loading_kwargs,
         )
 
+    def fetch_samples(self, worker_info=None):
+        traj_ind = self._sample_trajectory(worker_info)
+
+        traj_loading_kwargs = self.traj_loading_kwargs
+        if self.window_size is not None:
+            traj_loading_kwargs = dict(traj_loading_kwargs, **self._get_window_kwargs(traj_ind))
+        traj_samples = self._load_trajectory(traj_ind, traj_loading_kwargs)
+
         processed_traj_samples = [self.timestep_processer.forward(t) for t in traj_samples]
 
         return processed_traj_samples
+
+    def fetch_windows(self, history=1, horizon=0, stride=1, num_windows=1, worker_info=None):
+        """
+        Fetches num_windows windows, centered stride apart, of the processed timesteps t - history * stride, ..., t,
+        ..., t + horizon * stride, each with a "pad_mask" that is False where edge steps are repeated past either end.
+        """
+        traj_ind = self._sample_trajectory(worker_info)
+        window_length = history + 1 + horizon
+
+        # Choose Window Centers #
+        traj_length = int(self.get_traj_lengths()[traj_ind])
+        first_center = np.random.randint(max(traj_length - (num_windows - 1) * stride, 1))
+
+        # Read Every Window In One Pass, Starting At The First Step Inside The Trajectory #
+        first_step = first_center - history * stride
+        num_front_pad = max(-(first_step // stride), 0)
+        traj_loading_kwargs = dict(
+            self.traj_loading_kwargs,
+            start=first_step + num_front_pad * stride,
+            stride=stride,
+            max_len=num_windows - 1 + window_length - num_front_pad,
+            remove_skipped_steps=False,
+            num_samples_per_traj=None,
+        )
+        traj_samples = self._load_trajectory(traj_ind, traj_loading_kwargs)
+        processed_traj_samples = [self.timestep_processer.forward(t) for t in traj_samples]
+        if len(processed_traj_samples) == 0:
+            return []
+
+        # Slice Windows, Repeating Edge Steps #
+        windows = []
+        for i in range(num_windows):
+            positions = np.arange(i, i + window_length) - num_front_pad
+            pad_mask = (positions >= 0) & (positions < len(processed_traj_samples))
+            positions = np.clip(positions, 0, len(processed_traj_samples) - 1)
+            windows.append({"timesteps": [processed_traj_samples[p] for p in positions], "pad_mask": pad_mask})
+
+        return windows
@@ -1,5 +1,4 @@
 from collections import defaultdict
-from copy import deepcopy
 from itertools import chain
 
 import numpy as np
@@ -35,9 +34,10 @@ class TimestepProcesser:
         self.image_transformer = ImageTransformer(**image_transform_kwargs)
 
     def forward(self, timestep):
-        # Make Deep Copy #
-        timestep = deepcopy(timestep)
-
+        """
+        Processes a timestep (a dictionary, or a TimestepView of a StructuredTrajectory) without modifying it, so no
+        deep copy is made. Arrays kept from it are copied instead, so a view never keeps a whole trajectory alive.
+        """
         # Get Relevant Camera Info #
         camera_type_dict = {k: camera_type_to_string_dict[v] for k, v in timestep["observation"]["camera_type"].items()}
         sorted_camera_ids = sorted(camera_type_dict.keys())
@@ -61,7 +61,7 @@ class TimestepProcesser:
 
             for full_cam_id in sorted_calibrated_ids:
                 if serial_number in full_cam_id:
-                    cam2base = calibration_dict[full_cam_id]
+                    cam2base = np.array(calibration_dict[full_cam_id])
                     extrinsics_dict[cam_type].append(cam2base)
 
         sorted_extrinsics_keys = sorted(extrinsics_dict.keys())
@@ -82,7 +82,7 @@ class TimestepProcesser:
             full_cam_ids = sorted(cam_intrinsics_obs.keys())
             for full_cam_id in full_cam_ids:
                 if serial_number in full_cam_id:
-                    intr = cam_intrinsics_obs[full_cam_id]
+                    intr = np.array(cam_intrinsics_obs[full_cam_id])
                     intrinsics_dict[cam_type].append(intr)
 
         sorted_intrinsics_keys = sorted(intrinsics_dict.keys())
@@ -103,6 +103,8 @@ class TimestepProcesser:
                 for full_obs_id in sorted_obs_ids:
                     if serial_number in full_obs_id:
                         data = obs_type_dict[full_obs_id]
+                        if isinstance(data, np.ndarray) and (data.base is not None):
+                            data = data.copy()
                         high_dim_state_dict[obs_type][cam_type].append(data)
 
         ### Finish Observation Portion ###
@@ -0,0 +1,12 @@
+import numpy as np
+
+
+def get_json_compatible(value):
+    """json.dumps default for NumPy scalars and arrays and bytes, as found in HDF5 attributes and trajectory metadata."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError("Object of type {0} is not JSON serializable".format(type(value).__name__))
@@ -6,6 +6,7 @@ import numpy as np
 
 from droid.plotting.misc import *
 from droid.plotting.text import *
+from droid.trajectory_utils.trajectory_reader import read_trajectory_attrs
 
 # Create Empty Objects #
 user_progress_dict = defaultdict(lambda: 0)
@@ -27,13 +28,14 @@ def analysis_func(hdf5_filepath, hdf5_file=None):
     traj_horizon = hdf5_file["action"]["joint_position"].shape[0]
     file_timestamp = os.path.getmtime(hdf5_filepath)
     day_index = get_bucket_index(file_timestamp)
-    orig_user = hdf5_file.attrs["user"]
+    attrs = read_trajectory_attrs(hdf5_file)
+    orig_user = attrs["user"]
     user = clean_user.get(orig_user, orig_user)
-    scene_id = hdf5_file.attrs.get("scene_id", 0)
-    is_new_scene = hdf5_file.attrs.get("scene_id", 0) not in all_scene_ids
-    traj_id = user + hdf5_file.attrs["time"]
+    scene_id = attrs.get("scene_id", 0)
+    is_new_scene = attrs.get("scene_id", 0) not in all_scene_ids
+    traj_id = user + attrs["time"]
     is_old_traj = traj_id in all_traj_ids
-    curr_task = hdf5_file.attrs["current_task"]
+    curr_task = attrs["current_task"]
     camera_poses = grab_3rd_person_extrinsics(
         hdf5_file["observation"]["camera_extrinsics"], hdf5_file["observation"]["camera_type"]
     )
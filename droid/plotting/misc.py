@@ -17,7 +17,7 @@ num_demos = 0
 def data_crawler(dirname, func_list=None, ignore_failure=True):
     global num_demos
     subfolders = [f.path for f in os.scandir(dirname) if f.is_dir()]
-    traj_files = [f.path for f in os.scandir(dirname) if (f.is_file() and "trajectory.h5" in f.path)]
+    traj_files = [f.path for f in os.scandir(dirname) if (f.is_file() and (f.name == "trajectory.h5"))]
     h5_file_exists = len(traj_files) == 1
 
     # Obey Success / Failure Requirements #
@@ -12,6 +12,7 @@ from typing import Dict, Optional, Tuple
 import h5py
 
 from droid.postprocessing.schema import TRAJECTORY_SCHEMA
+from droid.trajectory_utils.trajectory_reader import read_trajectory_attrs
 
 
 def parse_datetime(date_str: str, mode="day") -> datetime:
@@ -26,7 +27,7 @@ def parse_user(
 ) -> Tuple[Optional[str], Optional[str]]:
     try:
         with h5py.File(trajectory_dir / "trajectory.h5", "r") as h5:
-            user_alias = h5.attrs["user"].title()
+            user_alias = read_trajectory_attrs(h5)["user"].title()
             lab, user = aliases.get(user_alias, (None, None))
 
         assert user_alias in aliases, f"User alias `{user_alias}` not in REGISTERED_LAB_MEMBERS or REGISTERED_ALIASES!"
@@ -73,7 +74,11 @@ def parse_trajectory(
     try:
         with h5py.File(trajectory_dir / "trajectory.h5", "r") as h5:
             assert "action" in h5.keys(), "Incomplete HDF5 file; no actual trajectory data logged!"
-            trajectory_record, attrs, trajectory_length = {}, h5.attrs, int(h5["action"]["joint_position"].shape[0])
+            trajectory_record, attrs, trajectory_length = (
+                {},
+                read_trajectory_attrs(h5),
+                int(h5["action"]["joint_position"].shape[0]),
+            )
             exts = ["ext1", "ext2"]
 
             # Extract Camera Information
@@ -65,7 +65,8 @@ def run_indexing(
                     scanned_paths[outcome][rel_trajectory_dir] = True
                     errored_paths[outcome][rel_trajectory_dir] = (
                         "[Indexing Error] Missing/Invalid HDF5! "
-                        "If the HDF5 is missing/corrupt, you can delete this trajectory!"
+                        "If `trajectory.h5.journal` exists, rebuild it with `scripts/convert/recover_trajectories.py`; "
+                        "otherwise if the HDF5 is missing/corrupt, you can delete this trajectory!"
                     )
                     totals["scanned"][outcome] = len(scanned_paths[outcome])
                     totals["errored"][outcome] = len(errored_paths[outcome])
@@ -0,0 +1,312 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import av
+except ModuleNotFoundError:
+    print("WARNING: PyAV is not installed, so videos cannot be embedded in or read from trajectory files")
+
+# Pixel Formats For Raw Frames, By Number Of Channels (OpenCV Channel Order) #
+channels_to_pixel_format = {1: "gray", 3: "bgr24", 4: "bgra"}
+
+
+def create_byte_dataset(hdf5_file, path, chunk_size=2**19):
+    return hdf5_file.create_dataset(path, (0,), maxshape=(None,), chunks=(chunk_size,), dtype=np.uint8)
+
+
+def load_byte_dataset(dataset):
+    """Reads a whole uint8 dataset with a single read straight into a new buffer, and returns a memoryview of it."""
+    buffer = np.empty(dataset.shape[0], dtype=np.uint8)
+    if len(buffer):
+        dataset.read_direct(buffer)
+    return memoryview(buffer)
+
+
+class MemoryByteStream(io.RawIOBase):
+    """Seekable, read-only file-like view over a bytes-like buffer, which (unlike io.BytesIO) never copies it."""
+
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = len(self._buffer) + offset
+        else:
+            raise ValueError("Invalid whence ({0})".format(whence))
+        return self._position
+
+    def readinto(self, buffer):
+        num_bytes = max(min(len(buffer), len(self._buffer) - self._position), 0)
+        end = self._position + num_bytes
+        buffer[:num_bytes] = self._buffer[self._position : end]
+        self._position = end
+        return num_bytes
+
+
+class HDF5ByteStream(io.RawIOBase):
+    """
+    Seekable file-like view over a resizable uint8 HDF5 dataset, so video containers can be muxed into (or demuxed
+    from) a trajectory file without a temporary file. Writes grow the dataset geometrically, and closing the stream
+    trims it to the number of bytes written.
+    """
+
+    def __init__(self, dataset, mode="r", growth_factor=2):
+        assert mode in ["r", "w"]
+        self._dataset = dataset
+        self._mode = mode
+        self._growth_factor = growth_factor
+        self._size = dataset.shape[0] if (mode == "r") else 0
+        self._position = 0
+
+    def readable(self):
+        return self._mode == "r"
+
+    def writable(self):
+        return self._mode == "w"
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self._size + offset
+        else:
+            raise ValueError("Invalid whence ({0})".format(whence))
+        return self._position
+
+    def readinto(self, buffer):
+        num_bytes = max(min(len(buffer), self._size - self._position), 0)
+        if num_bytes == 0:
+            return 0
+
+        # Read Straight Into The Caller's Buffer #
+        end = self._position + num_bytes
+        destination = np.frombuffer(buffer, dtype=np.uint8, count=num_bytes)
+        self._dataset.read_direct(destination, source_sel=np.s_[self._position : end])
+        self._position = end
+        return num_bytes
+
+    def write(self, data):
+        data = np.frombuffer(data, dtype=np.uint8)
+        end = self._position + len(data)
+
+        # Make Room For Data #
+        capacity = self._dataset.shape[0]
+        if end > capacity:
+            self._dataset.resize(max(int(capacity * self._growth_factor), end), axis=0)
+
+        # Save Data #
+        self._dataset[self._position : end] = data
+        self._position = end
+        self._size = max(self._size, end)
+        return len(data)
+
+    def close(self):
+        if (not self.closed) and self.writable():
+            self._dataset.resize(self._size, axis=0)
+        super().close()
+
+
+class HDF5VideoWriter:
+    """
+    Encodes frames straight into a uint8 HDF5 dataset as an MP4 stream. The container is opened lazily, so the frame
+    size (and pixel format, unless it is given) are taken from the first frame.
+    """
+
+    def __init__(
+        self, dataset, fps=15, codec="libx264", gop_size=15, codec_options={"preset": "veryfast"}, pixel_format=None
+    ):
+        self.dataset = dataset
+        self.fps = fps
+        self.codec = codec
+        self.gop_size = gop_size
+        self.codec_options = codec_options
+        self.num_frames = 0
+
+        self._byte_stream = HDF5ByteStream(dataset, mode="w")
+        self._container = None
+        self._stream = None
+
+        # Save What The Reader Needs To Map Timestamps And Restore Frames #
+        self.dataset.attrs["fps"] = self.fps
+        if pixel_format is not None:
+            self.dataset.attrs["pixel_format"] = pixel_format
+
+    def _open_container(self, frame):
+        self._container = av.open(self._byte_stream, mode="w", format="mp4")
+        self._stream = self._container.add_stream(self.codec, rate=self.fps, options=self.codec_options)
+        self._stream.width = frame.shape[1]
+        self._stream.height = frame.shape[0]
+        self._stream.pix_fmt = "yuv420p"
+        self._stream.codec_context.gop_size = self.gop_size
+
+        # Save Pixel Format If It Wasn't Given #
+        if "pixel_format" not in self.dataset.attrs:
+            num_channels = 1 if (frame.ndim == 2) else frame.shape[2]
+            self.dataset.attrs["pixel_format"] = channels_to_pixel_format[num_channels]
+
+    def append_data(self, frame, index=None):
+        """Encodes a frame. If index is given it is used as the frame timestamp, so skipped indices leave a gap."""
+        if self._container is None:
+            self._open_container(frame)
+
+        # Encode Frame #
+        num_channels = 1 if (frame.ndim == 2) else frame.shape[2]
+        video_frame = av.VideoFrame.from_ndarray(frame, format=channels_to_pixel_format[num_channels])
+        video_frame.pts = self.num_frames if (index is None) else index
+        self.num_frames += 1
+
+        # Mux Encoded Packets #
+        for packet in self._stream.encode(video_frame):
+            self._container.mux(packet)
+
+    def close(self):
+        # Flush Encoder #
+        if self._container is not None:
+            for packet in self._stream.encode():
+                self._container.mux(packet)
+            self._container.close()
+
+        # Trim Dataset #
+        self._byte_stream.close()
+
+
+class HDF5VideoReader:
+    """
+    Random access decoder for a video embedded by HDF5VideoWriter, read straight from the HDF5 dataset. Packets are
+    demuxed once without decoding to index frame timestamps and keyframes, so a read only seeks (to the closest
+    preceding keyframe) when the frame cannot be reached by decoding forward. If decode_ahead is positive, decoding
+    runs in a background thread that also decodes up to decode_ahead upcoming frames.
+
+    Since indexing demuxes the whole stream anyway, by default the video is loaded into memory with one HDF5 read and
+    demuxed from there. With in_memory=False, it is instead streamed from the dataset as the demuxer asks for bytes.
+    """
+
+    def __init__(self, dataset, decode_ahead=0, in_memory=True):
+        byte_stream = MemoryByteStream(load_byte_dataset(dataset)) if in_memory else HDF5ByteStream(dataset, mode="r")
+        self._container = av.open(byte_stream, mode="r", format="mp4")
+        self._stream = self._container.streams.video[0]
+        self.fps = dataset.attrs.get("fps", float(self._stream.guessed_rate or 15))
+        self.pixel_format = dataset.attrs.get("pixel_format", "rgb24")
+        self._index_packets()
+
+        self._decode_ahead = decode_ahead
+        self._executor = ThreadPoolExecutor(max_workers=1) if (decode_ahead > 0) else None
+        self._prefetched = {}
+        self._frame_iterator = None
+        self._last_index = None
+        self._last_frame = None
+
+    def _pts_to_index(self, pts):
+        return int(round(pts * self._stream.time_base * self.fps))
+
+    def _index_packets(self):
+        frame_indices, keyframe_indices = [], []
+        self._keyframe_pts = {}
+
+        for packet in self._container.demux(self._stream):
+            # Skip Flush Packets #
+            if packet.pts is None:
+                continue
+
+            index = self._pts_to_index(packet.pts)
+            frame_indices.append(index)
+            if packet.is_keyframe:
+                keyframe_indices.append(index)
+                self._keyframe_pts[index] = packet.pts
+
+        self.frame_indices = np.sort(frame_indices)
+        self.keyframe_indices = np.sort(keyframe_indices)
+
+    def __len__(self):
+        return len(self.frame_indices)
+
+    def _seek(self, keyframe_index):
+        self._container.seek(int(self._keyframe_pts[keyframe_index]), stream=self._stream, backward=True)
+        self._frame_iterator = self._container.decode(self._stream)
+        self._last_index = None
+
+    def _decode_frame(self, index):
+        # Frames Dropped While Recording Hold The Latest Earlier Frame #
+        position = np.searchsorted(self.frame_indices, index, side="right") - 1
+        if position < 0:
+            return None
+        target_index = self.frame_indices[position]
+        if target_index == self._last_index:
+            return self._last_frame
+
+        # Seek Unless The Frame Is Reachable By Decoding Forward #
+        keyframe_index = self.keyframe_indices[np.searchsorted(self.keyframe_indices, target_index, side="right") - 1]
+        decode_forward = (self._last_index is not None) and (keyframe_index <= self._last_index < target_index)
+        if not decode_forward:
+            self._seek(keyframe_index)
+
+        # Decode Up To Frame, Only Converting The One Returned #
+        for frame in self._frame_iterator:
+            self._last_index = self._pts_to_index(frame.pts)
+            if self._last_index >= target_index:
+                self._last_frame = frame.to_ndarray(format=self.pixel_format)
+                return self._last_frame
+
+        raise RuntimeError("Frame {0} is missing from the video stream".format(target_index))
+
+    def prefetch(self, index, upcoming_indices=None):
+        """
+        Starts decoding the frame at index (and up to decode_ahead after it) in the background, if decode_ahead is
+        positive. If the indices that will be read next are known, pass them as upcoming_indices to decode only those.
+        """
+        if self._executor is None:
+            return
+
+        # Drop Prefetches Outside The Window #
+        if upcoming_indices is None:
+            last_index = self.frame_indices[-1] if len(self) else index
+            upcoming_indices = range(index + 1, min(index + self._decode_ahead, last_index) + 1)
+        window = [index, *[int(i) for i in upcoming_indices[: self._decode_ahead]]]
+        for prefetched_index in list(self._prefetched):
+            if prefetched_index not in window:
+                self._prefetched.pop(prefetched_index).cancel()
+
+        for prefetch_index in window:
+            if prefetch_index not in self._prefetched:
+                self._prefetched[prefetch_index] = self._executor.submit(self._decode_frame, prefetch_index)
+
+    def read_frame(self, index, upcoming_indices=None):
+        """Returns the frame recorded at timestep index, or None if the video starts after it."""
+        if len(self) == 0:
+            return None
+        if self._executor is None:
+            return self._decode_frame(index)
+
+        self.prefetch(index, upcoming_indices=upcoming_indices)
+        return self._prefetched.pop(index).result()
+
+    def close(self):
+        if self._executor is not None:
+            for future in self._prefetched.values():
+                future.cancel()
+            self._executor.shutdown(wait=True)
+        self._container.close()
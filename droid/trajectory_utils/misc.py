@@ -12,7 +12,8 @@ from droid.camera_utils.wrappers.recorded_multi_camera_wrapper import RecordedMu
 from droid.misc.parameters import *
 from droid.misc.time import time_ms
 from droid.misc.transformations import change_pose_frame
-from droid.trajectory_utils.trajectory_reader import TrajectoryReader
+from droid.trajectory_utils.structured_trajectory import StructuredTrajectory
+from droid.trajectory_utils.trajectory_reader import TrajectoryReader, unflatten_dict
 from droid.trajectory_utils.trajectory_writer import TrajectoryWriter
 
 
@@ -29,6 +30,7 @@ def collect_trajectory(
     recording_folderpath=False,
     randomize_reset=False,
     reset_robot=True,
+    pending_closes=None,
 ):
     """
     Collects a robot trajectory.
@@ -36,6 +38,8 @@ def collect_trajectory(
     - If a horizon is given, we will step the environment accordingly
     - Otherwise, we will end the trajectory when the controller tells us to
     - If you need a pointer to the current observation, pass a dictionary in for obs_pointer
+    - If you pass a list in for pending_closes, the trajectory file is finalized in the background, and a Future for
+      it is appended to the list (see TrajectoryWriter.close_async)
     """
 
     # Check Parameters #
@@ -45,6 +49,8 @@ def collect_trajectory(
         assert controller is not None
     if obs_pointer is not None:
         assert isinstance(obs_pointer, dict)
+    if pending_closes is not None:
+        assert isinstance(pending_closes, list)
     if save_images:
         assert save_filepath is not None
 
@@ -125,7 +131,9 @@ def collect_trajectory(
         if end_traj:
             if recording_folderpath:
                 env.camera_reader.stop_recording()
-            if save_filepath:
+            if save_filepath and (pending_closes is not None):
+                pending_closes.append(traj_writer.close_async(metadata=controller_info))
+            elif save_filepath:
                 traj_writer.close(metadata=controller_info)
             return controller_info
 
@@ -322,73 +330,107 @@ def load_trajectory(
     camera_kwargs={},
     remove_skipped_steps=False,
     num_samples_per_traj=None,
-    num_samples_per_traj_coeff=1.5,
+    num_samples_per_traj_coeff=1.5,  # Unused, since sampling happens after skipped steps are masked out
+    cache_index=False,
+    stride=1,  # Reads every stride-th step from start up to (but not including) end, before removing skipped steps
+    start=0,
+    end=None,
+    max_len=None,
+    structured=False,  # Returns a StructuredTrajectory, with one contiguous array per key
 ):
+    """Loads a trajectory as an array of timestep dictionaries, decoding camera frames only for returned steps."""
     read_hdf5_images = read_cameras and (recording_folderpath is None)
     read_recording_folderpath = read_cameras and (recording_folderpath is not None)
 
-    traj_reader = TrajectoryReader(filepath, read_images=read_hdf5_images)
+    decode_ahead = 0 if num_samples_per_traj else 2
+    traj_reader = TrajectoryReader(
+        filepath, read_images=read_hdf5_images, cache_index=cache_index, decode_ahead=decode_ahead
+    )
     if read_recording_folderpath:
         camera_reader = RecordedMultiCameraWrapper(recording_folderpath, camera_kwargs)
 
     horizon = traj_reader.length()
-    timestep_list = []
+    indices_to_save = np.arange(start, horizon if (end is None) else min(end, horizon), stride)
+
+    # Mask Skipped Steps #
+    if remove_skipped_steps:
+        movement_key = "observation/controller_info/movement_enabled"
+        if movement_key in traj_reader.keys():
+            movement_enabled = traj_reader.read_columns(keys=[movement_key], indices=indices_to_save)[movement_key]
+            indices_to_save = indices_to_save[movement_enabled.astype(bool)]
 
     # Choose Timesteps To Save #
-    if num_samples_per_traj:
-        num_to_save = num_samples_per_traj
-        if remove_skipped_steps:
-            num_to_save = int(num_to_save * num_samples_per_traj_coeff)
-        max_size = min(num_to_save, horizon)
-        indices_to_save = np.sort(np.random.choice(horizon, size=max_size, replace=False))
-    else:
-        indices_to_save = np.arange(horizon)
+    if max_len is not None:
+        indices_to_save = indices_to_save[:max_len]
+    if num_samples_per_traj and (len(indices_to_save) > num_samples_per_traj):
+        indices_to_save = np.sort(np.random.choice(indices_to_save, size=num_samples_per_traj, replace=False))
 
-    # Iterate Over Trajectory #
-    for i in indices_to_save:
-        # Get HDF5 Data #
-        timestep = traj_reader.read_timestep(index=i)
+    # Read Low Dimensional Data For Every Chosen Step At Once #
+    columns = traj_reader.read_columns(indices=indices_to_save)
+    timestep_list, camera_columns = [], {}
+    num_steps = len(indices_to_save)
+
+    for j, i in enumerate(indices_to_save):
+        camera_obs = {}
+
+        # Get HDF5 Images #
+        if read_hdf5_images:
+            camera_obs["image"] = traj_reader.read_images(i, upcoming_indices=indices_to_save[j + 1 :])
 
         # If Applicable, Get Recorded Data #
         if read_recording_folderpath:
-            timestamp_dict = timestep["observation"]["timestamp"]["cameras"]
+            timestamp_dict = get_column_group(columns, "observation/timestamp/cameras", j)
             camera_type_dict = {
-                k: camera_type_to_string_dict[v] for k, v in timestep["observation"]["camera_type"].items()
+                k: camera_type_to_string_dict[v]
+                for k, v in get_column_group(columns, "observation/camera_type", j).items()
             }
-            camera_obs = camera_reader.read_cameras(
+            recorded_obs = camera_reader.read_cameras(
                 index=i, camera_type_dict=camera_type_dict, timestamp_dict=timestamp_dict
             )
-            camera_failed = camera_obs is None
 
-            # Add Data To Timestep If Successful #
-            if camera_failed:
+            # Stop At The First Step The Cameras Fail On #
+            if recorded_obs is None:
+                num_steps = j
                 break
-            else:
-                timestep["observation"].update(camera_obs)
+            camera_obs.update(recorded_obs)
 
-        # Filter Steps #
-        step_skipped = not timestep["observation"]["controller_info"].get("movement_enabled", True)
-        delete_skipped_step = step_skipped and remove_skipped_steps
-
-        # Save Filtered Timesteps #
-        if delete_skipped_step:
-            del timestep
+        # Structured Trajectories Fill Camera Columns, Rather Than Building A Dictionary Per Step #
+        if structured:
+            add_camera_rows(camera_columns, camera_obs, j, len(indices_to_save))
         else:
+            timestep = unflatten_dict({path: column[j] for path, column in columns.items()})
+            timestep["observation"].update(camera_obs)
             timestep_list.append(timestep)
 
-    # Remove Extra Transitions #
-    timestep_list = np.array(timestep_list)
-    if (num_samples_per_traj is not None) and (len(timestep_list) > num_samples_per_traj):
-        ind_to_keep = np.random.choice(len(timestep_list), size=num_samples_per_traj, replace=False)
-        timestep_list = timestep_list[ind_to_keep]
-
     # Close Readers #
     traj_reader.close()
     if read_recording_folderpath:
         camera_reader.disable_cameras()
 
     # Return Data #
-    return timestep_list
+    if structured:
+        traj_columns = {path: column[:num_steps] for path, column in {**columns, **camera_columns}.items()}
+        return StructuredTrajectory(traj_columns)
+    return np.array(timestep_list)
+
+
+def get_column_group(columns, prefix, index):
+    """Returns row index of the columns under prefix, as a nested dictionary."""
+    prefix = prefix + "/"
+    return unflatten_dict(
+        {path[len(prefix) :]: column[index] for path, column in columns.items() if path.startswith(prefix)}
+    )
+
+
+def add_camera_rows(camera_columns, camera_obs, index, num_steps):
+    """Writes camera observations (e.g. {"image": {camera_id: frame}}) into row index of per camera columns."""
+    for obs_type, obs_dict in camera_obs.items():
+        for obs_id, value in obs_dict.items():
+            path = "observation/{0}/{1}".format(obs_type, obs_id)
+            if path not in camera_columns:
+                value = np.asarray(value)
+                camera_columns[path] = np.zeros((num_steps, *value.shape), dtype=value.dtype)
+            camera_columns[path][index] = value
 
 
 def visualize_timestep(timestep, max_width=1000, max_height=500, aspect_ratio=1.5, pause_time=15):
@@ -459,12 +501,16 @@ def visualize_trajectory(
         camera_reader = RecordedMultiCameraWrapper(recording_folderpath, camera_kwargs)
 
     horizon = traj_reader.length()
-    camera_failed = False
 
     for i in range(horizon):
         # Get HDF5 Data #
         timestep = traj_reader.read_timestep()
 
+        # Filter Skipped Steps Before Reading Their Frames #
+        step_skipped = not timestep["observation"]["controller_info"].get("movement_enabled", True)
+        if step_skipped and remove_skipped_steps:
+            continue
+
         # If Applicable, Get Recorded Data #
         if recording_folderpath:
             timestamp_dict = timestep["observation"]["timestamp"]["cameras"]
@@ -477,15 +523,9 @@ def visualize_trajectory(
             camera_failed = camera_obs is None
 
             # Add Data To Timestep #
-            if not camera_failed:
-                timestep["observation"].update(camera_obs)
-
-        # Filter Steps #
-        step_skipped = not timestep["observation"]["controller_info"].get("movement_enabled", True)
-        delete_skipped_step = step_skipped and remove_skipped_steps
-        delete_step = delete_skipped_step or camera_failed
-        if delete_step:
-            continue
+            if camera_failed:
+                continue
+            timestep["observation"].update(camera_obs)
 
         # Get Image Info #
         assert "image" in timestep["observation"]
@@ -0,0 +1,106 @@
+from collections.abc import Mapping
+from copy import deepcopy
+
+import numpy as np
+
+from droid.trajectory_utils.trajectory_writer import flatten_dict
+
+
+def build_key_tree(paths, sep="/"):
+    """Maps every group prefix (the root is "") to the names of its children, in insertion order."""
+    children = {"": []}
+    for path in paths:
+        prefix = ""
+        for key in path.split(sep):
+            if key not in children[prefix]:
+                children[prefix].append(key)
+            prefix = prefix + key + sep
+            children.setdefault(prefix, [])
+    return children
+
+
+class StructuredTrajectory:
+    """
+    Compact trajectory that stores one contiguous array per flattened key (e.g. "action/cartesian_position" or
+    "observation/image/<camera_id>") instead of a nested dictionary per timestep. Indexing with an integer returns a
+    lazy TimestepView that behaves like the nested timestep dictionary, while slices, index arrays and boolean masks
+    return a new StructuredTrajectory.
+    """
+
+    __slots__ = ("columns", "_children", "_length")
+
+    def __init__(self, columns):
+        self.columns = dict(columns)
+        self._children = build_key_tree(self.columns)
+
+        lengths = {len(column) for column in self.columns.values()}
+        assert len(lengths) <= 1, "Trajectory columns have different lengths ({0})".format(sorted(lengths))
+        self._length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_timesteps(cls, timesteps):
+        flat_timesteps = [flatten_dict(timestep, keys_to_ignore=[]) for timestep in timesteps]
+        if len(flat_timesteps) == 0:
+            return cls({})
+        return cls({path: np.stack([t[path] for t in flat_timesteps]) for path in flat_timesteps[0]})
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if not (-self._length <= index < self._length):
+                raise IndexError("Timestep {0} is out of range for {1} timesteps".format(index, self._length))
+            return TimestepView(self, int(index) % self._length)
+        return StructuredTrajectory({path: column[index] for path, column in self.columns.items()})
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield TimestepView(self, i)
+
+    def to_dicts(self):
+        return [timestep.to_dict() for timestep in self]
+
+    def nbytes(self):
+        return sum(np.asarray(column).nbytes for column in self.columns.values())
+
+
+class TimestepView(Mapping):
+    """
+    Read-only, dictionary-like view of one timestep (or one group within it) of a StructuredTrajectory. Values are
+    read from the trajectory columns on access. Copying or pickling a view materializes it as a nested dictionary.
+    """
+
+    __slots__ = ("_trajectory", "_index", "_prefix")
+
+    def __init__(self, trajectory, index, prefix=""):
+        self._trajectory = trajectory
+        self._index = index
+        self._prefix = prefix
+
+    def __getitem__(self, key):
+        path = self._prefix + key
+        column = self._trajectory.columns.get(path)
+        if column is not None:
+            return column[self._index]
+        if (path + "/") in self._trajectory._children:
+            return TimestepView(self._trajectory, self._index, path + "/")
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._trajectory._children[self._prefix])
+
+    def __len__(self):
+        return len(self._trajectory._children[self._prefix])
+
+    def to_dict(self):
+        return {key: value.to_dict() if isinstance(value, TimestepView) else value for key, value in self.items()}
+
+    def __deepcopy__(self, memo):
+        return deepcopy(self.to_dict(), memo)
+
+    def __reduce__(self):
+        return (dict, (self.to_dict(),))
+
+    def __repr__(self):
+        return "TimestepView(index={0}, keys={1})".format(self._index, list(self))
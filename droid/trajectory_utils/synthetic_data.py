@@ -0,0 +1,195 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from droid.trajectory_utils.trajectory_writer import TrajectoryWriter
+
+# Serial Numbers Of The Synthetic Cameras (The First Is Mounted On The Wrist) #
+SYNTHETIC_SERIAL_START = 10000000
+
+
+def get_synthetic_serials(num_cameras=3):
+    return [str(SYNTHETIC_SERIAL_START + i) for i in range(num_cameras)]
+
+
+def generate_robot_state(rng):
+    return {
+        "cartesian_position": rng.standard_normal(6),
+        "gripper_position": rng.random(),
+        "joint_positions": rng.standard_normal(7),
+        "joint_velocities": rng.standard_normal(7),
+        "joint_torques_computed": rng.standard_normal(7),
+        "prev_joint_torques_computed": rng.standard_normal(7),
+        "prev_joint_torques_computed_safened": rng.standard_normal(7),
+        "motor_torques_measured": rng.standard_normal(7),
+        "prev_controller_latency_ms": rng.random(),
+        "prev_command_successful": True,
+    }
+
+
+def generate_image(step, image_shape, camera_index=0):
+    """Smooth pattern that drifts across the frame over time, so it compresses like real footage rather than noise."""
+    height, width = image_shape[:2]
+    rows = (np.arange(height, dtype=np.uint16)[:, None] + step * 2 + camera_index * 17) % 256
+    cols = (np.arange(width, dtype=np.uint16)[None, :] + step * 3) % 256
+    image = np.empty(image_shape, dtype=np.uint8)
+    for channel in range(1 if (len(image_shape) == 2) else image_shape[2]):
+        pattern = ((rows * (channel + 1) + cols) // 2 % 256).astype(np.uint8)
+        if len(image_shape) == 2:
+            image[:] = pattern
+        else:
+            image[..., channel] = pattern
+    return image
+
+
+def generate_timestep(step, num_cameras=3, image_shape=None, rng=None):
+    """
+    Returns a timestep with the same key layout as data collected on the robot (see scripts/convert/to_tfrecord.py)
+    without touching any hardware. Each camera is a stereo pair, and the first camera is treated as the wrist camera.
+    If image_shape is given (e.g. (720, 1280, 4) for a ZED at HD720), the observation includes synthetic images.
+    """
+    rng = np.random.default_rng(step) if (rng is None) else rng
+    serials = get_synthetic_serials(num_cameras)
+    full_cam_ids = [s + side for s in serials for side in ["_left", "_right"]]
+    timestamp_ms = 1000 * step // 15
+    robot_state = generate_robot_state(rng)
+
+    # Camera Info #
+    camera_extrinsics = {cam_id: rng.standard_normal(6) for cam_id in full_cam_ids}
+    if num_cameras > 0:
+        for side in ["_left", "_right"]:
+            camera_extrinsics[serials[0] + side + "_gripper_offset"] = np.ones(6)
+    camera_timestamps = {}
+    for serial in serials:
+        for key in ["read_start", "read_end", "frame_received", "estimated_capture"]:
+            camera_timestamps[serial + "_" + key] = timestamp_ms
+
+    # Observation #
+    observation = {
+        "controller_info": {"controller_on": True, "failure": False, "movement_enabled": True, "success": False},
+        "robot_state": robot_state,
+        "camera_type": {s: int(i == 0) for i, s in enumerate(serials)},
+        "camera_extrinsics": camera_extrinsics,
+        "camera_intrinsics": {cam_id: np.eye(3) for cam_id in full_cam_ids},
+        "timestamp": {
+            "cameras": camera_timestamps,
+            "control": {
+                k: timestamp_ms for k in ["step_start", "policy_start", "sleep_start", "control_start", "step_end"]
+            },
+            "robot_state": {
+                "read_start": timestamp_ms,
+                "read_end": timestamp_ms,
+                "robot_timestamp_seconds": timestamp_ms // 1000,
+                "robot_timestamp_nanos": (timestamp_ms % 1000) * 1000000,
+            },
+            "skip_action": False,
+        },
+    }
+    if image_shape is not None:
+        observation["image"] = {
+            cam_id: generate_image(step, image_shape, camera_index=i) for i, cam_id in enumerate(full_cam_ids)
+        }
+
+    # Action #
+    action = {
+        "cartesian_position": rng.standard_normal(6),
+        "cartesian_velocity": rng.standard_normal(6),
+        "gripper_position": rng.random(),
+        "gripper_velocity": rng.random(),
+        "joint_position": rng.standard_normal(7),
+        "joint_velocity": rng.standard_normal(7),
+        "target_cartesian_position": rng.standard_normal(6),
+        "target_gripper_position": rng.random(),
+        "robot_state": dict(robot_state),
+    }
+
+    return {"observation": observation, "action": action}
+
+
+def generate_trajectory(num_steps, num_cameras=3, image_shape=None, seed=0):
+    rng = np.random.default_rng(seed)
+    for step in range(num_steps):
+        yield generate_timestep(step, num_cameras=num_cameras, image_shape=image_shape, rng=rng)
+
+
+def generate_metadata(traj_id, num_buildings=3, num_scenes=5):
+    return {
+        "user": "synthetic_user_{0}".format(traj_id % 2),
+        "building": "building_{0}".format(traj_id % num_buildings),
+        "scene_id": traj_id % num_scenes,
+        "current_task": "synthetic task {0}".format(traj_id % 4),
+        "robot_serial_number": "synthetic_robot",
+        "time": "2023-01-01-00h-00m-{0:02d}s".format(traj_id % 60),
+        "success": True,
+        "failure": False,
+    }
+
+
+def generate_data_tree(
+    data_dir,
+    num_trajectories=4,
+    num_steps=150,
+    num_cameras=3,
+    image_shape=(180, 320, 3),
+    save_mp4=True,
+    save_hdf5_videos=False,
+    fps=15,
+):
+    """
+    Writes synthetic episodes laid out like collected data: <data_dir>/success/<date>/<episode>/trajectory.h5, with
+    side-by-side stereo MP4 recordings (plus their frame timestamps) in recordings/MP4. Returns the episode folderpaths.
+    """
+    folderpaths = []
+    serials = get_synthetic_serials(num_cameras)
+    generate_images = save_mp4 or save_hdf5_videos
+
+    for traj_id in range(num_trajectories):
+        # Prepare Episode Folder #
+        folderpath = os.path.join(data_dir, "success", "2023-01-01", "synthetic_{0:04d}".format(traj_id))
+        recording_folderpath = os.path.join(folderpath, "recordings", "MP4")
+        os.makedirs(recording_folderpath, exist_ok=True)
+
+        # Open Writers #
+        filepath = os.path.join(folderpath, "trajectory.h5")
+        metadata = generate_metadata(traj_id)
+        traj_writer = TrajectoryWriter(
+            filepath, metadata=metadata, exists_ok=True, save_images=save_hdf5_videos, video_fps=fps
+        )
+        video_writers, recording_timestamps = {}, {serial: [] for serial in serials}
+        if save_mp4:
+            for serial in serials:
+                video_writers[serial] = cv2.VideoWriter(
+                    os.path.join(recording_folderpath, serial + ".mp4"),
+                    cv2.VideoWriter_fourcc(*"mp4v"),
+                    fps,
+                    (2 * image_shape[1], image_shape[0]),
+                )
+
+        # Write Timesteps #
+        timesteps = generate_trajectory(
+            num_steps, num_cameras=num_cameras, image_shape=image_shape if generate_images else None, seed=traj_id
+        )
+        for timestep in timesteps:
+            observation = timestep["observation"]
+            for serial, video_writer in video_writers.items():
+                left_image = observation["image"][serial + "_left"][..., :3]
+                right_image = observation["image"][serial + "_right"][..., :3]
+                video_writer.write(np.concatenate([left_image, right_image], axis=1))
+                recording_timestamps[serial].append(observation["timestamp"]["cameras"][serial + "_frame_received"])
+
+            if not save_hdf5_videos:
+                observation.pop("image", None)
+            traj_writer.write_timestep(timestep)
+
+        # Close Writers #
+        traj_writer.close()
+        for serial, video_writer in video_writers.items():
+            video_writer.release()
+            with open(os.path.join(recording_folderpath, serial + "_timestamps.json"), "w") as timestamp_file:
+                json.dump(recording_timestamps[serial], timestamp_file)
+
+        folderpaths.append(folderpath)
+
+    return folderpaths
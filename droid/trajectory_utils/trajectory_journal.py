@@ -0,0 +1,74 @@
+import json
+import struct
+
+import numpy as np
+
+from droid.misc.json_utils import get_json_compatible
+
+JOURNAL_MAGIC = b"DROIDJNL"
+JOURNAL_VERSION = 1
+JOURNAL_SUFFIX = ".journal"
+
+
+def get_journal_filepath(filepath):
+    return filepath + JOURNAL_SUFFIX
+
+
+def get_record_dtype(schema_entries):
+    return np.dtype([(path, np.dtype(dtype), tuple(shape)) for path, dtype, shape in schema_entries])
+
+
+class TrajectoryJournal:
+    """
+    Append-only write-ahead journal of timesteps. The file holds a magic string, a length-prefixed JSON header (the
+    flattened schema and the trajectory metadata), and then one fixed-size binary record per timestep, laid out as a
+    NumPy structured array. Records are written unbuffered, so everything written survives a crash of the process.
+    """
+
+    def __init__(self, filepath, metadata=None):
+        self.filepath = filepath
+        self.metadata = {} if (metadata is None) else dict(metadata)
+        self.schema = None
+        self.record_dtype = None
+        self.num_records = 0
+        self._file = open(filepath, "wb", buffering=0)
+
+    def write_header(self, schema):
+        self.schema = schema
+        schema_entries = [(entry.path, entry.dtype.str, entry.shape) for entry in schema.entries]
+        self.record_dtype = get_record_dtype(schema_entries)
+
+        header = json.dumps({"schema": schema_entries, "metadata": self.metadata}, default=get_json_compatible)
+        header = header.encode("utf-8")
+        self._file.write(JOURNAL_MAGIC + struct.pack("<IQ", JOURNAL_VERSION, len(header)) + header)
+
+    def write_record(self, record):
+        self._file.write(record.tobytes())
+        self.num_records += 1
+
+    def create_record(self):
+        return np.zeros((), dtype=self.record_dtype)
+
+    def close(self):
+        self._file.close()
+
+
+def read_journal(filepath):
+    """Returns (metadata, records) from a journal, dropping a partially written final record if there is one."""
+    with open(filepath, "rb") as journal_file:
+        # Read Header #
+        magic = journal_file.read(len(JOURNAL_MAGIC))
+        if magic != JOURNAL_MAGIC:
+            raise ValueError("{0} is not a trajectory journal".format(filepath))
+        version, header_length = struct.unpack("<IQ", journal_file.read(struct.calcsize("<IQ")))
+        if version != JOURNAL_VERSION:
+            raise ValueError("Unsupported trajectory journal version ({0})".format(version))
+        header = json.loads(journal_file.read(header_length).decode("utf-8"))
+        record_dtype = get_record_dtype(header["schema"])
+
+        # Read Complete Records #
+        data = journal_file.read()
+        num_records = len(data) // record_dtype.itemsize
+        records = np.frombuffer(data, dtype=record_dtype, count=num_records)
+
+    return header["metadata"], records
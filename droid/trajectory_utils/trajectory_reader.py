@@ -1,91 +1,218 @@
-import tempfile
+import json
+import os
+import time
 
 import h5py
-import imageio
+import numpy as np
 
+from droid.trajectory_utils.hdf5_video import HDF5VideoReader, load_byte_dataset
+from droid.trajectory_utils.trajectory_writer import WRITER_INFO_KEY
 
-def create_video_file(suffix=".mp4", byte_contents=None):
-    # Create Temporary File #
-    temp_file = tempfile.NamedTemporaryFile(suffix=suffix)
-    filename = temp_file.name
+INDEX_SUFFIX = ".index.json"
 
-    # If Byte Contents Provided, Write To File #
-    if byte_contents is not None:
-        with open(filename, "wb") as binary_file:
-            binary_file.write(byte_contents)
 
-    return filename
+def get_dataset_length(dataset):
+    # Constant Columns Store One Row Plus Their Length #
+    return dataset.attrs.get("constant_length", dataset.shape[0])
 
 
-def get_hdf5_length(hdf5_file, keys_to_ignore=[]):
-    length = None
+def get_dataset_paths(hdf5_group, keys_to_ignore=[]):
+    """Returns the path of every dataset under hdf5_group, skipping groups and datasets named in keys_to_ignore."""
+    dataset_paths = []
 
-    for key in hdf5_file.keys():
-        if key in keys_to_ignore:
-            continue
+    def visit(path, obj):
+        if isinstance(obj, h5py.Dataset) and not any(key in keys_to_ignore for key in path.split("/")):
+            dataset_paths.append(path)
 
-        curr_data = hdf5_file[key]
-        if isinstance(curr_data, h5py.Group):
-            curr_length = get_hdf5_length(curr_data, keys_to_ignore=keys_to_ignore)
-        elif isinstance(curr_data, h5py.Dataset):
-            curr_length = len(curr_data)
-        else:
-            raise ValueError
+    hdf5_group.visititems(visit)
+    return dataset_paths
 
-        if length is None:
-            length = curr_length
-        assert curr_length == length
 
-    return length
+def build_dataset_index(hdf5_file, keys_to_ignore=["videos", WRITER_INFO_KEY]):
+    """Flat index from every dataset path to its length, and whether it is stored as a constant column."""
+    dataset_index = {}
+    for path in get_dataset_paths(hdf5_file, keys_to_ignore=keys_to_ignore):
+        dataset = hdf5_file[path]
+        dataset_index[path] = {
+            "length": int(get_dataset_length(dataset)),
+            "constant": "constant_length" in dataset.attrs,
+        }
+    return dataset_index
 
 
-def load_hdf5_to_dict(hdf5_file, index, keys_to_ignore=[]):
-    data_dict = {}
+def get_index_length(dataset_index):
+    lengths = {entry["length"] for entry in dataset_index.values()}
+    assert len(lengths) <= 1, "Trajectory datasets have different lengths ({0})".format(sorted(lengths))
+    return lengths.pop() if lengths else None
+
+
+def get_index_filepath(filepath):
+    return filepath + INDEX_SUFFIX
+
+
+def get_file_key(filepath):
+    file_stat = os.stat(filepath)
+    return {"file_size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns}
+
+
+def load_dataset_index(filepath):
+    """Returns the sidecar dataset index of a trajectory file, or None if it is missing or the file has changed."""
+    try:
+        with open(get_index_filepath(filepath), "r") as index_file:
+            sidecar = json.load(index_file)
+    except (OSError, ValueError):
+        return None
+
+    if sidecar.get("file_key") != get_file_key(filepath):
+        return None
+    return sidecar["datasets"]
+
 
-    for key in hdf5_file.keys():
-        if key in keys_to_ignore:
-            continue
+def save_dataset_index(filepath, dataset_index):
+    """Saves a sidecar dataset index next to a trajectory file. Returns False if the directory is not writable."""
+    index_filepath = get_index_filepath(filepath)
+    temp_filepath = "{0}.{1}.tmp".format(index_filepath, os.getpid())
+    sidecar = {"file_key": get_file_key(filepath), "datasets": dataset_index}
 
-        curr_data = hdf5_file[key]
-        if isinstance(curr_data, h5py.Group):
-            data_dict[key] = load_hdf5_to_dict(curr_data, index, keys_to_ignore=keys_to_ignore)
-        elif isinstance(curr_data, h5py.Dataset):
-            data_dict[key] = curr_data[index]
+    try:
+        with open(temp_filepath, "w") as index_file:
+            json.dump(sidecar, index_file)
+        os.replace(temp_filepath, index_filepath)
+    except OSError:
+        return False
+    return True
+
+
+def read_dataset_rows(dataset, indices=None):
+    """Reads rows of a dataset in a single HDF5 read. indices may be None (all rows), a slice, or a list of indices."""
+    length = get_dataset_length(dataset)
+
+    # Expand Constant Columns Without Copying #
+    if "constant_length" in dataset.attrs:
+        if indices is None:
+            num_rows = length
+        elif isinstance(indices, slice):
+            num_rows = len(range(length)[indices])
         else:
-            raise ValueError
+            num_rows = len(indices)
+        return np.broadcast_to(dataset[0], (num_rows, *dataset.shape[1:]))
+
+    if indices is None:
+        return dataset[()]
+    if isinstance(indices, slice):
+        return dataset[indices]
+
+    # Read The Covering Range Once, Then Index In Memory #
+    indices = np.asarray(indices, dtype=np.int64)
+    if len(indices) == 0:
+        return np.empty((0, *dataset.shape[1:]), dtype=dataset.dtype)
+    indices = np.where(indices < 0, indices + length, indices)
+    start, end = indices.min(), indices.max() + 1
+    assert start >= 0 and end <= length
+    return dataset[start:end][indices - start]
+
+
+def read_json_dataset(dataset):
+    buffer = load_byte_dataset(dataset)
+    return json.loads(bytes(buffer)) if len(buffer) else None
+
+
+def read_trajectory_attrs(hdf5_file):
+    """
+    Returns the attributes of a trajectory file as a dictionary, including the metadata and writer_stats that a
+    TrajectoryWriter(swmr=True) saves as JSON under writer_info on close (SWMR files can't take new attributes).
+    Attributes on the file take precedence, so relabelling a trajectory after it is closed still applies.
+    """
+    attrs = {}
+    writer_info = hdf5_file.get(WRITER_INFO_KEY)
+    if isinstance(writer_info, h5py.Group):
+        metadata = read_json_dataset(writer_info["metadata"])
+        if metadata is not None:
+            attrs.update(metadata)
+        writer_stats = read_json_dataset(writer_info["writer_stats"])
+        if writer_stats is not None:
+            attrs["writer_stats"] = json.dumps(writer_stats)
+    attrs.update(dict(hdf5_file.attrs))
+    return attrs
 
+
+def unflatten_dict(flat_dict, sep="/"):
+    data_dict = {}
+    for path, value in flat_dict.items():
+        curr_dict = data_dict
+        *parents, key = path.split(sep)
+        for parent in parents:
+            curr_dict = curr_dict.setdefault(parent, {})
+        curr_dict[key] = value
     return data_dict
 
 
 class TrajectoryReader:
-    def __init__(self, filepath, read_images=True):
-        self._hdf5_file = h5py.File(filepath, "r")
-        is_video_folder = "observations/videos" in self._hdf5_file
-        self._read_images = read_images and is_video_folder
-        self._length = get_hdf5_length(self._hdf5_file)
+    def __init__(self, filepath, read_images=True, cache_index=False, decode_ahead=2, follow=False):
+        """
+        The paths and lengths of every low dimensional dataset are indexed once on open. If cache_index is True, the
+        index is also saved to (and loaded from) a sidecar file next to the trajectory, keyed by file size and mtime,
+        so reopening an unchanged file skips walking the HDF5 tree.
+
+        Embedded videos are decoded at any index, with each stream decoding up to decode_ahead frames ahead of the
+        last read in a background thread (set it to 0 to decode synchronously, e.g. for sparse random reads).
+
+        If follow is True, the file is opened as an HDF5 single-writer/multiple-reader (SWMR) reader, so a trajectory
+        that a TrajectoryWriter(swmr=True) is still recording can be read as it grows (see refresh and tail). Videos
+        are only readable once the writer is closed, so images are not read while following.
+        """
+        if follow:
+            self._hdf5_file = h5py.File(filepath, "r", libver="latest", swmr=True)
+        else:
+            self._hdf5_file = h5py.File(filepath, "r")
+        is_video_folder = "observation/videos" in self._hdf5_file
+        self._read_images = read_images and is_video_folder and (not follow)
         self._video_readers = {}
+        self._decode_ahead = decode_ahead
+        self._follow = follow
         self._index = 0
 
+        # Index Datasets #
+        self._dataset_index = load_dataset_index(filepath) if (cache_index and not follow) else None
+        if self._dataset_index is None:
+            self._dataset_index = build_dataset_index(self._hdf5_file)
+            if cache_index and not follow:
+                save_dataset_index(filepath, self._dataset_index)
+        self._path_keys = {path: path.split("/") for path in self._dataset_index}
+        self._datasets = {}
+        if follow:
+            self.refresh()
+        else:
+            self._length = get_index_length(self._dataset_index)
+
     def length(self):
         return self._length
 
+    def keys(self):
+        """Returns the path of every low dimensional dataset in the trajectory."""
+        return list(self._dataset_index)
+
     def read_timestep(self, index=None, keys_to_ignore=[]):
         # Make Sure We Read Within Range #
         if index is None:
             index = self._index
         else:
-            assert not self._read_images
             self._index = index
         assert index < self._length
 
         # Load Low Dimensional Data #
-        keys_to_ignore = [*keys_to_ignore.copy(), "videos"]
-        timestep = load_hdf5_to_dict(self._hdf5_file, self._index, keys_to_ignore=keys_to_ignore)
+        flat_timestep = {}
+        for path, path_keys in self._path_keys.items():
+            if any(key in keys_to_ignore for key in path_keys):
+                continue
+            dataset = self._get_dataset(path)
+            flat_timestep[path] = dataset[0] if self._dataset_index[path]["constant"] else dataset[index]
+        timestep = unflatten_dict(flat_timestep)
 
         # Load High Dimensional Data #
         if self._read_images:
-            camera_obs = self._uncompress_images()
-            timestep["observations"]["image"] = camera_obs
+            camera_obs = self._uncompress_images(index)
+            timestep["observation"]["image"] = camera_obs
 
         # Increment Read Index #
         self._index += 1
@@ -93,24 +220,90 @@ class TrajectoryReader:
         # Return Timestep #
         return timestep
 
-    def _uncompress_images(self):
-        # WARNING: THIS FUNCTION HAS NOT BEEN TESTED. UNDEFINED BEHAVIOR FOR FAILED READING. #
-        video_folder = self._hdf5_file["observations/videos"]
+    def _get_dataset(self, path):
+        if path not in self._datasets:
+            self._datasets[path] = self._hdf5_file[path]
+        return self._datasets[path]
+
+    def read_columns(self, keys=None, indices=None):
+        """
+        Reads whole low dimensional columns in one pass, and returns them as a flat dictionary of NumPy arrays keyed by
+        dataset path (e.g. "action/cartesian_position"). Each key may name a dataset or a group, in which case every
+        dataset under it is read. indices may be None (every timestep), a slice, or a list of timestep indices.
+        """
+        dataset_paths = list(self._dataset_index)
+        if keys is not None:
+            dataset_paths = [
+                path for path in dataset_paths if any(path == key or path.startswith(key + "/") for key in keys)
+            ]
+            assert len(dataset_paths) > 0, "None of {0} are in the trajectory".format(keys)
+
+        return {path: read_dataset_rows(self._get_dataset(path), indices) for path in dataset_paths}
+
+    def iter_timesteps(self, keys=None, indices=None):
+        """Yields low dimensional timesteps as nested dictionaries, sliced from columns read up front by read_columns."""
+        columns = self.read_columns(keys=keys, indices=indices)
+        num_timesteps = len(next(iter(columns.values())))
+
+        for i in range(num_timesteps):
+            yield unflatten_dict({path: column[i] for path, column in columns.items()})
+
+    def refresh(self):
+        """
+        Picks up rows flushed by a live writer since the file was opened or last refreshed, and returns the new length.
+        Columns are flushed one at a time, so the length only counts rows that every column has received.
+        """
+        assert self._follow, "Only readers opened with follow=True can refresh"
+        for path, entry in self._dataset_index.items():
+            dataset = self._get_dataset(path)
+            dataset.refresh()
+            entry["length"] = int(dataset.shape[0])
+        self._length = min([entry["length"] for entry in self._dataset_index.values()], default=0)
+        return self._length
+
+    def tail(self, keys_to_ignore=[], poll_interval=0.1, timeout=None):
+        """
+        Yields timesteps from the current read index onwards as a live writer flushes them, polling for new rows every
+        poll_interval seconds. Stops once no new rows have arrived for timeout seconds (or never, if it is None).
+        """
+        last_row_time = time.time()
+        while True:
+            if (self._index < self._length) or (self.refresh() > self._index):
+                yield self.read_timestep(keys_to_ignore=keys_to_ignore)
+                last_row_time = time.time()
+            elif (timeout is not None) and (time.time() - last_row_time >= timeout):
+                return
+            else:
+                time.sleep(poll_interval)
+
+    def read_images(self, index, upcoming_indices=None):
+        """
+        Returns the embedded camera images at timestep index, keyed by video id. upcoming_indices are the indices that
+        will be read next, if known, so only those are decoded ahead.
+        """
+        return self._uncompress_images(index, upcoming_indices=upcoming_indices) if self._read_images else {}
+
+    def _uncompress_images(self, index, upcoming_indices=None):
+        video_folder = self._hdf5_file["observation/videos"]
         camera_obs = {}
 
+        # Create Video Readers If They Haven't Been Made #
         for video_id in video_folder:
-            # Create Video Reader If One Hasn't Been Made #
             if video_id not in self._video_readers:
-                serialized_video = video_folder[video_id]
-                filename = create_video_file(byte_contents=serialized_video)
-                self._video_readers[video_id] = imageio.get_reader(filename)
+                self._video_readers[video_id] = HDF5VideoReader(video_folder[video_id], decode_ahead=self._decode_ahead)
+
+        # Start Decoding Every Stream Before Waiting On Any #
+        for video_reader in self._video_readers.values():
+            video_reader.prefetch(index, upcoming_indices=upcoming_indices)
 
-            # Read Next Frame #
-            camera_obs[video_id] = yield self._video_readers[video_id]
-            # Future Note: Could Make Thread For Each Image Reader
+        for video_id, video_reader in self._video_readers.items():
+            frame = video_reader.read_frame(index, upcoming_indices=upcoming_indices)
+            if frame is not None:
+                camera_obs[video_id] = frame
 
-        # Return Camera Observation #
         return camera_obs
 
     def close(self):
+        for video_reader in self._video_readers.values():
+            video_reader.close()
         self._hdf5_file.close()
@@ -1,14 +1,27 @@
+import json
 import os
-import tempfile
-from collections import defaultdict
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
 from copy import deepcopy
+from fnmatch import fnmatch
+from functools import reduce
+from operator import getitem, itemgetter
 from queue import Empty, Queue
 
 import h5py
-import imageio
 import numpy as np
 
+from droid.misc.json_utils import get_json_compatible
 from droid.misc.subprocess_utils import run_threaded_command
+from droid.trajectory_utils.hdf5_video import HDF5VideoWriter, channels_to_pixel_format, create_byte_dataset
+from droid.trajectory_utils.trajectory_journal import (
+    JOURNAL_SUFFIX,
+    TrajectoryJournal,
+    get_journal_filepath,
+    read_journal,
+)
 
 
 def write_dict_to_hdf5(hdf5_file, data_dict, keys_to_ignore=["image", "depth", "pointcloud"]):
@@ -44,97 +57,731 @@ def write_dict_to_hdf5(hdf5_file, data_dict, keys_to_ignore=["image", "depth", "
         hdf5_file[key][-1] = curr_data
 
 
+def flatten_dict(data_dict, keys_to_ignore=["image", "depth", "pointcloud"], prefix=""):
+    flat_dict = {}
+
+    for key in data_dict.keys():
+        # Pass Over Specified Keys #
+        if key in keys_to_ignore:
+            continue
+
+        # Unwrap If Dictionary #
+        curr_data = data_dict[key]
+        if type(curr_data) == dict:
+            flat_dict.update(flatten_dict(curr_data, keys_to_ignore=keys_to_ignore, prefix=prefix + key + "/"))
+        else:
+            flat_dict[prefix + key] = curr_data
+
+    return flat_dict
+
+
+class SchemaDriftError(ValueError):
+    """Raised when a timestep no longer matches the schema compiled from the first timestep of a trajectory."""
+
+    def __init__(self, missing_keys=[], new_keys=[], mismatched_keys=[]):
+        self.missing_keys = sorted(missing_keys)
+        self.new_keys = sorted(new_keys)
+        self.mismatched_keys = sorted(mismatched_keys)
+        super().__init__(
+            "Timestep does not match trajectory schema (missing: {0}, new: {1}, mismatched: {2})".format(
+                self.missing_keys, self.new_keys, self.mismatched_keys
+            )
+        )
+
+
+SchemaEntry = namedtuple("SchemaEntry", ["path", "dtype", "shape", "extractor"])
+
+
+def compile_extractor(keys):
+    # Build A Getter For A Fixed Nested Key Path #
+    if len(keys) == 1:
+        return itemgetter(keys[0])
+    return lambda data_dict: reduce(getitem, keys, data_dict)
+
+
+class TimestepSchema:
+    """
+    Flat write plan for nested timestep dictionaries, compiled once from the first timestep of a trajectory.
+    - Each entry is a (path, dtype, shape, extractor) tuple, so later timesteps are flattened without type inspection
+    - Keys added or removed mid-trajectory raise a SchemaDriftError instead of silently misaligning columns
+    """
+
+    def __init__(self, entries, group_sizes, keys_to_ignore=["image", "depth", "pointcloud"]):
+        self.entries = entries
+        self.keys_to_ignore = keys_to_ignore
+        self._group_sizes = group_sizes
+
+    @classmethod
+    def from_timestep(cls, timestep, keys_to_ignore=["image", "depth", "pointcloud"]):
+        entries, group_sizes = [], []
+
+        def visit(data_dict, keys):
+            group_sizes.append([compile_extractor(keys) if keys else (lambda d: d), len(data_dict)])
+
+            for key in data_dict.keys():
+                # Pass Over Specified Keys #
+                if key in keys_to_ignore:
+                    continue
+
+                # Unwrap If Dictionary #
+                curr_data = data_dict[key]
+                if type(curr_data) == dict:
+                    visit(curr_data, [*keys, key])
+                    continue
+
+                # Add Entry #
+                curr_data = np.asarray(curr_data)
+                path = "/".join([*keys, key])
+                entries.append(SchemaEntry(path, curr_data.dtype, curr_data.shape, compile_extractor([*keys, key])))
+
+        visit(timestep, [])
+        return cls(entries, group_sizes, keys_to_ignore=keys_to_ignore)
+
+    def extract(self, timestep):
+        # Check For New Keys #
+        for group_size in self._group_sizes:
+            extractor, size = group_size
+            try:
+                curr_size = len(extractor(timestep))
+            except (KeyError, TypeError):
+                raise self.get_drift_error(timestep) from None
+            if curr_size != size:
+                self.check_drift(timestep)
+                group_size[1] = curr_size
+
+        # Extract Values In Plan Order #
+        try:
+            return [entry.extractor(timestep) for entry in self.entries]
+        except (KeyError, TypeError):
+            raise self.get_drift_error(timestep) from None
+
+    def check_drift(self, timestep):
+        drift_error = self.get_drift_error(timestep)
+        if drift_error.missing_keys or drift_error.new_keys:
+            raise drift_error
+
+    def get_drift_error(self, timestep):
+        expected_keys = {entry.path for entry in self.entries}
+        actual_keys = set(flatten_dict(timestep, keys_to_ignore=self.keys_to_ignore).keys())
+        return SchemaDriftError(missing_keys=expected_keys - actual_keys, new_keys=actual_keys - expected_keys)
+
+
+# Named Compression Profiles: (Path Pattern, Dataset Options) Pairs, Where The First Matching Pattern Wins #
+COMPRESSION_PROFILES = {
+    "none": [],
+    "lzf": [
+        ("observation/camera_extrinsics/*", {"constant": True}),
+        ("observation/camera_intrinsics/*", {"constant": True}),
+        ("observation/camera_type/*", {"constant": True}),
+        ("*", {"compression": "lzf", "shuffle": True}),
+    ],
+    "gzip": [
+        ("observation/camera_extrinsics/*", {"constant": True}),
+        ("observation/camera_intrinsics/*", {"constant": True}),
+        ("observation/camera_type/*", {"constant": True}),
+        ("*", {"compression": "gzip", "compression_opts": 4, "shuffle": True}),
+    ],
+}
+
+
+def get_dataset_options(path, compression_profile):
+    for pattern, options in compression_profile:
+        if fnmatch(path, pattern):
+            return options
+    return {}
+
+
+def create_hdf5_dataset(hdf5_file, path, dshape, dtype, chunk_size=None, preallocate=True, **dataset_kwargs):
+    # Live Layout: No Rows Until They Are Written, So Readers Never See Unwritten Rows #
+    if not preallocate:
+        chunks = (chunk_size or LIVE_CHUNK_SIZE, *dshape)
+        return hdf5_file.create_dataset(
+            path, (0, *dshape), maxshape=(None, *dshape), chunks=chunks, dtype=dtype, **dataset_kwargs
+        )
+
+    # Legacy Layout: One Row, Grown As Rows Are Written #
+    if chunk_size is None:
+        return hdf5_file.create_dataset(path, (1, *dshape), maxshape=(None, *dshape), dtype=dtype, **dataset_kwargs)
+
+    # Chunked Layout: Preallocate A Full Chunk Of Rows #
+    return hdf5_file.create_dataset(
+        path,
+        (chunk_size, *dshape),
+        maxshape=(None, *dshape),
+        chunks=(chunk_size, *dshape),
+        dtype=dtype,
+        **dataset_kwargs,
+    )
+
+
+class HDF5ColumnWriter:
+    """
+    Appends blocks of rows to the datasets of an HDF5 file, keeping dataset handles open between writes.
+    - If chunk_size is given, datasets are preallocated in chunks of chunk_size rows and grown geometrically by
+      growth_factor, otherwise they are resized to fit every write
+    - compression_profile is a list of (path pattern, options) pairs. Options are passed to create_dataset (ie.
+      compression, compression_opts, shuffle), except for chunk_size, which overrides the writer chunk size, and
+      constant, which stores a single row plus a constant_length attribute for as long as the column never changes
+    - trim() cuts every dataset down to its written length, and should be called before the file is closed
+    - If live is True, datasets always hold exactly the rows written so far, and constant columns are stored in full,
+      so readers of a file in SWMR mode never see unwritten rows
+    """
+
+    def __init__(self, hdf5_file, chunk_size=None, growth_factor=2, compression_profile=[], live=False):
+        self.hdf5_file = hdf5_file
+        self.chunk_size = chunk_size
+        self.growth_factor = growth_factor
+        self.compression_profile = compression_profile
+        self.live = live
+        self.datasets = {}
+        self.lengths = {}
+        self._chunk_sizes = {}
+        self._constant_rows = {}
+
+    def _create_dataset(self, path, rows):
+        dataset_kwargs = dict(get_dataset_options(path, self.compression_profile))
+        chunk_size = dataset_kwargs.pop("chunk_size", self.chunk_size)
+        constant = dataset_kwargs.pop("constant", False) and (not self.live)
+
+        self.datasets[path] = create_hdf5_dataset(
+            self.hdf5_file,
+            path,
+            rows.shape[1:],
+            rows.dtype,
+            chunk_size=chunk_size,
+            preallocate=not self.live,
+            **dataset_kwargs,
+        )
+        self.lengths[path] = 0
+        self._chunk_sizes[path] = chunk_size
+
+        if constant:
+            self.datasets[path][0] = rows[0]
+            self._constant_rows[path] = rows[0].copy()
+
+    def _materialize_constant(self, path):
+        # Repeat The Stored Row, So The Column Can Be Appended To As Usual #
+        dataset, length = self.datasets[path], self.lengths[path]
+        constant_row = self._constant_rows.pop(path)
+        if length > dataset.shape[0]:
+            dataset.resize(length, axis=0)
+        if length > 1:
+            dataset[1:length] = np.broadcast_to(constant_row, (length - 1, *constant_row.shape))
+
+    def append(self, path, rows):
+        num_rows = len(rows)
+
+        # Create Dataset If Necesary #
+        if path not in self.datasets:
+            self._create_dataset(path, rows)
+
+        # Count Rows Of Constant Columns #
+        if path in self._constant_rows:
+            if (rows == self._constant_rows[path]).all():
+                self.lengths[path] += num_rows
+                return
+            self._materialize_constant(path)
+
+        # Make Room For Data #
+        dataset, index, chunk_size = self.datasets[path], self.lengths[path], self._chunk_sizes[path]
+        if index + num_rows > dataset.shape[0]:
+            if (chunk_size is None) or self.live:
+                new_size = index + num_rows
+            else:
+                new_size = max(int(dataset.shape[0] * self.growth_factor), index + num_rows + chunk_size)
+            dataset.resize(new_size, axis=0)
+
+        # Save Data #
+        dataset[index : index + num_rows] = rows
+        self.lengths[path] = index + num_rows
+
+    def trim(self):
+        # Cut Preallocated Datasets Down To Their Written Length #
+        for path, length in self.lengths.items():
+            dataset = self.datasets[path]
+            if path in self._constant_rows:
+                dataset.resize(1, axis=0)
+                dataset.attrs["constant_length"] = length
+            elif dataset.shape[0] != length:
+                dataset.resize(length, axis=0)
+
+        self.datasets.clear()
+
+
+class TimestepBuffer:
+    """
+    Columnar staging buffer for timesteps: each flattened key maps to a preallocated array of flush_size rows, which is
+    written to HDF5 with a single slice assignment per dataset when the buffer is flushed.
+    - The flattening plan is compiled from the first timestep added (see TimestepSchema)
+    """
+
+    def __init__(self, flush_size, keys_to_ignore=["image", "depth", "pointcloud"]):
+        self.flush_size = flush_size
+        self.keys_to_ignore = keys_to_ignore
+        self.schema = None
+        self._columns = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def is_full(self):
+        return self._size >= self.flush_size
+
+    def add(self, timestep):
+        # Compile Schema On First Timestep #
+        if self.schema is None:
+            self.schema = TimestepSchema.from_timestep(timestep, keys_to_ignore=self.keys_to_ignore)
+            self._columns = [np.empty((self.flush_size, *e.shape), dtype=e.dtype) for e in self.schema.entries]
+
+        # Copy Values Into Columns #
+        values = self.schema.extract(timestep)
+        for entry, column, value in zip(self.schema.entries, self._columns, values):
+            try:
+                column[self._size] = value
+            except ValueError:
+                raise SchemaDriftError(mismatched_keys=[entry.path]) from None
+
+        self._size += 1
+
+    def flush(self, column_writer):
+        if self._size == 0:
+            return
+
+        for entry, column in zip(self.schema.entries, self._columns):
+            column_writer.append(entry.path, column[: self._size])
+
+        self._size = 0
+
+
+def recover_trajectory(journal_filepath, filepath=None, compression_profile="none"):
+    """
+    Rebuilds the HDF5 file of a trajectory whose writer never finished, from its (possibly partial) journal.
+    - The rebuilt file replaces filepath (by default, the journal path without its suffix). Videos are not recovered
+    - Returns the number of recovered timesteps
+    """
+    if filepath is None:
+        assert journal_filepath.endswith(JOURNAL_SUFFIX)
+        filepath = journal_filepath[: -len(JOURNAL_SUFFIX)]
+    if isinstance(compression_profile, str):
+        compression_profile = COMPRESSION_PROFILES[compression_profile]
+
+    metadata, records = read_journal(journal_filepath)
+
+    # Write To A Temporary File, So A Failed Recovery Leaves The Original In Place #
+    recovered_filepath = filepath + ".recovered"
+    with h5py.File(recovered_filepath, "w") as hdf5_file:
+        for key, value in metadata.items():
+            hdf5_file.attrs[key] = value
+        hdf5_file.attrs["recovered_from_journal"] = True
+
+        column_writer = HDF5ColumnWriter(hdf5_file, compression_profile=compression_profile)
+        for path in records.dtype.names:
+            column_writer.append(path, np.ascontiguousarray(records[path]))
+        column_writer.trim()
+
+    os.replace(recovered_filepath, filepath)
+    return len(records)
+
+
+class WriterQueue(Queue):
+    """
+    Bounded queue for writer threads that tracks its peak depth, peak lag and dropped items. When full, put() either
+    blocks (policy="block"), drops the oldest queued item (policy="drop_oldest"), or, once half full, drops every other
+    incoming item until the writer catches up (policy="downsample").
+    """
+
+    def __init__(self, maxsize=0, policy="block"):
+        assert policy in ["block", "drop_oldest", "downsample"]
+        super().__init__(maxsize=maxsize)
+        self.policy = policy
+        self.num_items = 0
+        self.num_dropped = 0
+        self.max_depth = 0
+        self.max_lag_ms = 0
+        self._skip_next = False
+
+    def put(self, item, block=True, timeout=None):
+        with self.mutex:
+            depth = self._qsize()
+            self.num_items += 1
+
+            # Drop Oldest Item If Full #
+            if (self.policy == "drop_oldest") and (0 < self.maxsize <= depth):
+                self.queue.popleft()
+                self.unfinished_tasks -= 1
+                self.num_dropped += 1
+
+            # Drop Every Other Item While Backed Up #
+            if (self.policy == "downsample") and (0 < self.maxsize <= 2 * depth):
+                self._skip_next = not self._skip_next
+                if self._skip_next:
+                    self.num_dropped += 1
+                    return
+            else:
+                self._skip_next = False
+
+        super().put(item, block=block, timeout=timeout)
+
+    def _put(self, item):
+        self.queue.append((time.time(), item))
+        self.max_depth = max(self.max_depth, self._qsize())
+
+    def _get(self):
+        put_time, item = self.queue.popleft()
+        self.max_lag_ms = max(self.max_lag_ms, (time.time() - put_time) * 1000)
+        return item
+
+    def get_stats(self):
+        return {
+            "policy": self.policy,
+            "num_items": self.num_items,
+            "num_dropped": self.num_dropped,
+            "max_depth": self.max_depth,
+            "max_lag_ms": round(self.max_lag_ms, 3),
+        }
+
+
+class EncoderStream:
+    """Handle for one stream served by an EncoderPool, which tracks its encode throughput."""
+
+    def __init__(self, writer, queue, worker_id):
+        self.writer = writer
+        self.queue = queue
+        self.worker_id = worker_id
+        self.num_encoded = 0
+        self.encode_time = 0
+        self.error = None
+
+    def process(self, item):
+        start_time = time.time()
+        try:
+            self.writer(item)
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+        self.encode_time += time.time() - start_time
+        self.num_encoded += 1
+
+    def get_encode_fps(self):
+        if self.encode_time == 0:
+            return 0
+        return round(self.num_encoded / self.encode_time, 3)
+
+
+class EncoderPool:
+    """
+    Fixed set of encoder threads shared by all camera streams, and reused across trajectories.
+    - Each stream is pinned to the least loaded worker when it is registered, so its frames are encoded in order
+    - Streams keep their own WriterQueue (and drop policy); workers are woken with one token per submitted item
+    """
+
+    def __init__(self, num_workers=3):
+        self.num_workers = num_workers
+        self._worker_queues = [Queue() for _ in range(num_workers)]
+        self._worker_loads = [0 for _ in range(num_workers)]
+        self._lock = threading.Lock()
+
+        for worker_id in range(num_workers):
+            run_threaded_command(self._run_worker, args=(worker_id,))
+
+    def register_stream(self, writer, queue):
+        with self._lock:
+            worker_id = int(np.argmin(self._worker_loads))
+            self._worker_loads[worker_id] += 1
+        return EncoderStream(writer, queue, worker_id)
+
+    def unregister_stream(self, stream):
+        with self._lock:
+            self._worker_loads[stream.worker_id] -= 1
+
+    def submit(self, stream, item):
+        stream.queue.put(item)
+        self._worker_queues[stream.worker_id].put(stream)
+
+    def _run_worker(self, worker_id):
+        worker_queue = self._worker_queues[worker_id]
+
+        while True:
+            stream = worker_queue.get()
+
+            # Items May Have Been Dropped By The Stream Queue #
+            try:
+                item = stream.queue.get_nowait()
+            except Empty:
+                continue
+
+            stream.process(item)
+            stream.queue.task_done()
+
+
+_default_encoder_pool = None
+
+# Chunk Size (In Rows) Of Datasets In Live (SWMR) Files Written Without A Chunk Size #
+LIVE_CHUNK_SIZE = 64
+
+# Group Of JSON Datasets That Stand In For Attributes Added On Close, Which SWMR Files Can't Take #
+WRITER_INFO_KEY = "writer_info"
+
+# Number Of Trajectories That May Be Finalized In The Background At Once (See TrajectoryWriter.close_async) #
+MAX_PENDING_CLOSES = 2
+_pending_close_slots = threading.BoundedSemaphore(MAX_PENDING_CLOSES)
+
+
+def write_json_dataset(dataset, data):
+    """Replaces the contents of a resizable uint8 dataset with data encoded as JSON."""
+    encoded = np.frombuffer(json.dumps(data, default=get_json_compatible).encode("utf-8"), dtype=np.uint8)
+    dataset.resize(len(encoded), axis=0)
+    dataset[:] = encoded
+
+
+def get_default_encoder_pool():
+    global _default_encoder_pool
+    if _default_encoder_pool is None:
+        _default_encoder_pool = EncoderPool()
+    return _default_encoder_pool
+
+
 class TrajectoryWriter:
-    def __init__(self, filepath, metadata=None, exists_ok=False, save_images=True):
+    def __init__(
+        self,
+        filepath,
+        metadata=None,
+        exists_ok=False,
+        save_images=True,
+        chunk_size=None,
+        growth_factor=2,
+        flush_size=1,  # Timesteps buffered per write
+        flush_interval=None,  # Seconds after which buffered timesteps are written anyway
+        video_fps=15,
+        queue_size=64,
+        video_queue_policy="block",  # See WriterQueue
+        compression_profile="none",  # A name from COMPRESSION_PROFILES, or (path pattern, options) pairs
+        journal=False,  # Journals timesteps, compacted into the HDF5 file on close (see recover_trajectory)
+        encoder_pool=None,  # Defaults to a pool shared by every writer in the process
+        swmr=False,  # Lets TrajectoryReader(follow=True) tail the file (see read_trajectory_attrs)
+    ):
+        """Writes timesteps to an HDF5 file from a background thread."""
         assert (not os.path.isfile(filepath)) or exists_ok
+        if journal:
+            assert (not os.path.isfile(get_journal_filepath(filepath))) or exists_ok
+        assert not (journal and swmr), "Journaled timesteps are only written to the HDF5 file on close"
         self._filepath = filepath
         self._save_images = save_images
-        self._hdf5_file = h5py.File(filepath, "w")
-        self._queue_dict = defaultdict(Queue)
+        self._swmr = swmr
+        self._flush_interval = flush_interval
+        self._video_fps = video_fps
+        self._buffer = TimestepBuffer(flush_size)
+        self._journal = None
+        self._last_flush_time = time.time()
+        if isinstance(compression_profile, str):
+            compression_profile = COMPRESSION_PROFILES[compression_profile]
+        self._hdf5_file = h5py.File(filepath, "w", libver="latest") if swmr else h5py.File(filepath, "w")
+        self._column_writer = HDF5ColumnWriter(
+            self._hdf5_file,
+            chunk_size=chunk_size,
+            growth_factor=growth_factor,
+            compression_profile=compression_profile,
+            live=swmr,
+        )
+        self._queue_size = queue_size
+        self._video_queue_policy = video_queue_policy
+        self._queue_dict = {"hdf5": WriterQueue(maxsize=queue_size)}
+        self._num_steps = 0
         self._video_writers = {}
-        self._video_files = {}
+        self._encoder_pool = get_default_encoder_pool() if (encoder_pool is None) else encoder_pool
+        self._encoder_streams = {}
+        self._write_error = None
         self._open = True
 
         # Add Metadata #
         if metadata is not None:
             self._update_metadata(metadata)
 
-        # Start HDF5 Writer Thread #
-        def hdf5_writer(data):
-            return write_dict_to_hdf5(self._hdf5_file, data)
+        # Create Datasets For What Is Saved On Close, While An SWMR File Can Still Take New Objects #
+        if swmr:
+            for key in ["metadata", "writer_stats"]:
+                create_byte_dataset(self._hdf5_file, WRITER_INFO_KEY + "/" + key, chunk_size=1024)
 
-        run_threaded_command(self._write_from_queue, args=(hdf5_writer, self._queue_dict["hdf5"]))
+        # Start HDF5 Writer Thread #
+        if journal:
+            self._journal = TrajectoryJournal(get_journal_filepath(filepath), metadata=metadata)
+            run_threaded_command(self._write_from_queue, args=(self._journal_timestep, self._queue_dict["hdf5"]))
+        else:
+            run_threaded_command(self._write_from_queue, args=(self._buffer_timestep, self._queue_dict["hdf5"]))
 
     def write_timestep(self, timestep):
         if self._save_images:
             self._update_video_files(timestep)
         self._queue_dict["hdf5"].put(timestep)
+        self._num_steps += 1
 
     def _update_metadata(self, metadata):
         for key in metadata:
             self._hdf5_file.attrs[key] = deepcopy(metadata[key])
 
+    def _buffer_timestep(self, timestep):
+        # Stop Writing After A Failed Step, So Columns Stay Aligned #
+        if self._write_error is not None:
+            return
+        self._buffer.add(timestep)
+
+        interval_passed = (self._flush_interval is not None) and (
+            time.time() - self._last_flush_time >= self._flush_interval
+        )
+        if self._buffer.is_full() or interval_passed:
+            self._flush_buffer()
+
+    def _journal_timestep(self, timestep):
+        # Stop Writing After A Failed Step, So Columns Stay Aligned #
+        if self._write_error is not None:
+            return
+
+        # Compile Schema On First Timestep #
+        if self._journal.schema is None:
+            self._journal.write_header(TimestepSchema.from_timestep(timestep))
+        schema = self._journal.schema
+
+        # Pack Values Into A Single Record #
+        record = self._journal.create_record()
+        for entry, value in zip(schema.entries, schema.extract(timestep)):
+            try:
+                record[entry.path] = value
+            except ValueError:
+                raise SchemaDriftError(mismatched_keys=[entry.path]) from None
+        self._journal.write_record(record)
+
+    def _compact_journal(self):
+        self._journal.close()
+        if self._journal.num_records == 0:
+            return
+
+        _, records = read_journal(self._journal.filepath)
+        for path in records.dtype.names:
+            self._column_writer.append(path, np.ascontiguousarray(records[path]))
+
+    def _flush_buffer(self):
+        self._buffer.flush(self._column_writer)
+        self._last_flush_time = time.time()
+
+        # Make Flushed Rows Visible To Live Readers (No Datasets Or Attributes Can Be Added After This) #
+        if self._swmr and (len(self._column_writer.datasets) > 0):
+            if not self._hdf5_file.swmr_mode:
+                self._hdf5_file.swmr_mode = True
+            self._hdf5_file.flush()
+
     def _write_from_queue(self, writer, queue):
         while self._open:
             try:
                 data = queue.get(timeout=1)
             except Empty:
                 continue
-            writer(data)
+
+            # Keep Draining The Queue If A Write Fails, And Report The Error On Close #
+            try:
+                writer(data)
+            except Exception as e:
+                if self._write_error is None:
+                    self._write_error = e
             queue.task_done()
 
     def _update_video_files(self, timestep):
-        image_dict = timestep["observations"]["image"]
-
-        for video_id in image_dict:
-            # Get Frame #
-            img = image_dict[video_id]
-            del image_dict[video_id]
-
-            # Create Writer And Buffer #
-            if video_id not in self._video_buffers:
-                filename = self.create_video_file(video_id, ".mp4")
-                self._video_writers[video_id] = imageio.get_writer(filename, macro_block_size=1)
-                run_threaded_command(
-                    self._write_from_queue, args=(self._video_writers[video_id].append_data, self._queue_dict[video_id])
+        image_dict = timestep["observation"].pop("image")
+
+        for video_id, img in image_dict.items():
+            # Streams Can't Be Added To An SWMR File After The First Timestep #
+            if (video_id not in self._video_writers) and self._swmr and (self._num_steps > 0):
+                print("WARNING: Dropping images from {0}, which was missing from the first timestep".format(video_id))
+                continue
+
+            # Create Writer And Register Stream #
+            if video_id not in self._video_writers:
+                dataset = create_byte_dataset(self._hdf5_file, "observation/videos/" + video_id)
+                num_channels = 1 if (img.ndim == 2) else img.shape[2]
+                video_writer = HDF5VideoWriter(
+                    dataset, fps=self._video_fps, pixel_format=channels_to_pixel_format[num_channels]
                 )
+                self._video_writers[video_id] = video_writer
+                self._queue_dict[video_id] = WriterQueue(maxsize=self._queue_size, policy=self._video_queue_policy)
 
-            # Add Image To Queue #
-            self._queue_dict[video_id].put(img)
+                def frame_writer(data, video_writer=video_writer):
+                    return video_writer.append_data(data[1], index=data[0])
 
-        del timestep["observations"]["image"]
+                self._encoder_streams[video_id] = self._encoder_pool.register_stream(
+                    frame_writer, self._queue_dict[video_id]
+                )
+
+            # Add Image To Queue (Tagged With Its Timestep, So Dropped Frames Leave A Gap) #
+            self._encoder_pool.submit(self._encoder_streams[video_id], (self._num_steps, img))
+
+    def close_async(self, metadata=None):
+        """
+        Finalizes the trajectory on a background thread, and returns a Future that resolves once the file is closed.
+        - Blocks while MAX_PENDING_CLOSES other trajectories are still being finalized, which bounds memory use
+        - Exceptions raised by close (ie. a SchemaDriftError) are set on the Future
+        """
+        future = Future()
+        _pending_close_slots.acquire()
+
+        def finalize():
+            try:
+                self.close(metadata=metadata)
+                future.set_result(self._filepath)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                _pending_close_slots.release()
 
-    def create_video_file(self, video_id, suffix):
-        temp_file = tempfile.NamedTemporaryFile(suffix=suffix)
-        self._video_files[video_id] = temp_file
-        return temp_file.name
+        # Non-Daemon Thread, So Exiting The Process Waits For The File To Be Finalized #
+        run_threaded_command(finalize, daemon=False)
+        return future
 
     def close(self, metadata=None):
-        # Add Metadata #
-        if metadata is not None:
+        # Add Metadata (As JSON If The File May Be In SWMR Mode) #
+        if (metadata is not None) and self._swmr:
+            write_json_dataset(self._hdf5_file[WRITER_INFO_KEY + "/metadata"], metadata)
+        elif metadata is not None:
             self._update_metadata(metadata)
 
         # Finish Remaining Jobs #
         [queue.join() for queue in self._queue_dict.values()]
 
+        # Release Encoder Streams #
+        for stream in self._encoder_streams.values():
+            self._encoder_pool.unregister_stream(stream)
+            if (stream.error is not None) and (self._write_error is None):
+                self._write_error = stream.error
+
+        # Save Queue Statistics #
+        writer_stats = {key: queue.get_stats() for key, queue in self._queue_dict.items()}
+        for video_id, stream in self._encoder_streams.items():
+            writer_stats[video_id]["encode_fps"] = stream.get_encode_fps()
+        if self._swmr:
+            write_json_dataset(self._hdf5_file[WRITER_INFO_KEY + "/writer_stats"], writer_stats)
+        else:
+            self._hdf5_file.attrs["writer_stats"] = json.dumps(writer_stats)
+
         # Close Video Writers #
         for video_id in self._video_writers:
             self._video_writers[video_id].close()
 
-        # Save Serialized Videos #
-        for video_id in self._video_files:
-            # Create Folder #
-            if "videos" not in self._hdf5_file["observations"]:
-                self._hdf5_file["observations"].create_group("videos")
-
-            # Get Serialized Video #
-            self._video_files[video_id].seek(0)
-            serialized_video = np.asarray(self._video_files[video_id].read())
+        # Flush Buffered Timesteps #
+        if self._journal is None:
+            self._flush_buffer()
+        else:
+            self._compact_journal()
 
-            # Save Data #
-            self._hdf5_file["observations"]["videos"].create_dataset(video_id, data=serialized_video)
-            self._video_files[video_id].close()
+        # Trim Preallocated Rows #
+        self._column_writer.trim()
 
         # Close File #
         self._hdf5_file.close()
         self._open = False
+
+        # Remove Compacted Journal #
+        if self._journal is not None:
+            os.remove(self._journal.filepath)
+
+        # Report Failed Writes #
+        if self._write_error is not None:
+            raise self._write_error
@@ -1,5 +1,6 @@
 import os
 import time
+from concurrent.futures import Future
 from copy import deepcopy
 from datetime import date
 
@@ -16,10 +17,13 @@ data_dir = os.path.join(dir_path, "../../data")
 
 
 class DataCollecter:
-    def __init__(self, env, controller, policy=None, save_data=True, save_traj_dir=None):
+    def __init__(self, env, controller, policy=None, save_data=True, save_traj_dir=None, close_async=True):
         self.env = env
         self.controller = controller
         self.policy = policy
+        self.close_async = close_async
+        self.pending_closes = []
+        self.last_close_future = None
 
         self.last_traj_path = None
         self.traj_running = False
@@ -89,9 +93,16 @@ class DataCollecter:
             if not os.path.isdir(recording_folderpath):
                 os.makedirs(recording_folderpath)
 
+        # Forget Finalized Trajectories #
+        for future in [f for f in self.pending_closes if f.done()]:
+            self.pending_closes.remove(future)
+            if future.exception() is not None:
+                print("WARNING: Failed to finalize trajectory: {0}".format(future.exception()))
+
         # Collect Trajectory #
         self.traj_running = True
         self.env._robot.establish_connection()
+        num_pending_closes = len(self.pending_closes)
         controller_info = tu.collect_trajectory(
             self.env,
             controller=self.controller,
@@ -102,16 +113,42 @@ class DataCollecter:
             recording_folderpath=recording_folderpath,
             save_filepath=save_filepath,
             wait_for_controller=True,
+            pending_closes=self.pending_closes if self.close_async else None,
         )
         self.traj_running = False
         self.obs_pointer = {}
 
         # Sort Trajectory #
         self.traj_saved = controller_info["success"] and (save_filepath is not None)
+        traj_path = os.path.join(self.failure_logdir, info["time"])
+        success_traj_path = os.path.join(self.success_logdir, info["time"]) if self.traj_saved else None
+
+        # Move Successes Once Their File Is Finalized, So Nothing Is Still Writing Into The Folder #
+        self.last_close_future = None
+        if len(self.pending_closes) > num_pending_closes:
+            self.last_close_future = self.move_when_closed(self.pending_closes.pop(), traj_path, success_traj_path)
+            self.pending_closes.append(self.last_close_future)
+        elif self.traj_saved:
+            os.rename(traj_path, success_traj_path)
 
         if self.traj_saved:
-            self.last_traj_path = os.path.join(self.success_logdir, info["time"])
-            os.rename(os.path.join(self.failure_logdir, info["time"]), self.last_traj_path)
+            self.last_traj_path = success_traj_path
+
+    def move_when_closed(self, close_future, traj_path, new_traj_path=None):
+        """Returns a Future that resolves once close_future does, and the trajectory is moved to new_traj_path."""
+        move_future = Future()
+
+        def move(future):
+            try:
+                future.result()
+                if new_traj_path is not None:
+                    os.rename(traj_path, new_traj_path)
+                move_future.set_result(new_traj_path or traj_path)
+            except Exception as e:
+                move_future.set_exception(e)
+
+        close_future.add_done_callback(move)
+        return move_future
 
     def calibrate_camera(self, cam_id, reset_robot=True):
         self.traj_running = True
@@ -155,10 +192,25 @@ class DataCollecter:
         gui_images, cam_ids = self.get_gui_imgs(obs)
         return gui_images, cam_ids
 
+    def wait_for_pending_closes(self):
+        # Log Failures, Rather Than Raising Them Into The GUI #
+        for future in self.pending_closes:
+            try:
+                future.result()
+            except Exception as e:
+                print("WARNING: Failed to finalize trajectory: {0}".format(e))
+        self.pending_closes = []
+
     def change_trajectory_status(self, success=False):
         if (self.last_traj_path is None) or (success == self.traj_saved):
             return
 
+        # Make Sure The Trajectory File Is Finalized #
+        self.wait_for_pending_closes()
+        if (self.last_close_future is not None) and (self.last_close_future.exception() is not None):
+            print("WARNING: Not relabelling {0}, which failed to finalize".format(self.last_traj_name))
+            return
+
         save_filepath = os.path.join(self.last_traj_path, "trajectory.h5")
         traj_file = h5py.File(save_filepath, "r+")
         traj_file.attrs["success"] = success
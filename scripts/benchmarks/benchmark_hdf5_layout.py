@@ -0,0 +1,90 @@
+"""
+benchmark_hdf5_layout.py
+
+Compares the legacy resize-by-one HDF5 layout (`write_dict_to_hdf5`, as the original `TrajectoryWriter` wrote every
+timestep) against the chunked, preallocated layout of `TrajectoryWriter` (with and without columnar batch flushing) on a
+synthetic trajectory. Reports wall time, bytes written through write syscalls, and
+final file size for each layout.
+
+Run from DROID directory root with: `python scripts/benchmarks/benchmark_hdf5_layout.py --num_steps 1000`
+"""
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import h5py
+import psutil
+import pyrallis
+
+from droid.trajectory_utils.synthetic_data import generate_timestep
+from droid.trajectory_utils.trajectory_writer import TrajectoryWriter, write_dict_to_hdf5
+
+
+@dataclass
+class BenchmarkConfig:
+    # fmt: off
+    num_steps: int = 1000                                   # Number of timesteps in the synthetic trajectory
+    chunk_sizes: List[int] = (64, 128, 256)                 # Chunk sizes (in rows) to benchmark the chunked layout at
+    flush_sizes: List[int] = (16, 64)                       # Buffer sizes (in timesteps) to benchmark batch flushing at
+    num_cameras: int = 3                                    # Number of (stereo) cameras in the synthetic timesteps
+    output_dir: Optional[str] = None                        # Where to write trajectories (defaults to a temp dir)
+
+    # fmt: on
+
+
+def get_bytes_written():
+    io_counters = psutil.Process().io_counters()
+    return getattr(io_counters, "write_chars", io_counters.write_bytes)
+
+
+def write_legacy_trajectory(filepath, timesteps):
+    with h5py.File(filepath, "w") as hdf5_file:
+        for timestep in timesteps:
+            write_dict_to_hdf5(hdf5_file, timestep)
+
+
+def write_trajectory(filepath, timesteps, chunk_size=None, flush_size=1):
+    traj_writer = TrajectoryWriter(filepath, save_images=False, chunk_size=chunk_size, flush_size=flush_size)
+    for timestep in timesteps:
+        traj_writer.write_timestep(timestep)
+    traj_writer.close()
+
+
+def benchmark_layout(filepath, timesteps, chunk_size=None, flush_size=1):
+    start_bytes, start_time = get_bytes_written(), time.time()
+
+    if chunk_size is None:
+        write_legacy_trajectory(filepath, timesteps)
+    else:
+        write_trajectory(filepath, timesteps, chunk_size=chunk_size, flush_size=flush_size)
+
+    return {
+        "wall_time_s": time.time() - start_time,
+        "bytes_written": get_bytes_written() - start_bytes,
+        "file_size": os.path.getsize(filepath),
+    }
+
+
+@pyrallis.wrap()
+def main(cfg: BenchmarkConfig) -> None:
+    output_dir = cfg.output_dir if cfg.output_dir is not None else tempfile.mkdtemp()
+    timesteps = [generate_timestep(i, num_cameras=cfg.num_cameras) for i in range(cfg.num_steps)]
+
+    print(f"[*] Writing {cfg.num_steps} synthetic timesteps to `{output_dir}`")
+    layouts = [("legacy", None, 1)] + [(f"chunked_{c}", c, 1) for c in cfg.chunk_sizes]
+    layouts += [(f"buffered_{f}", max(cfg.chunk_sizes), f) for f in cfg.flush_sizes]
+    for name, chunk_size, flush_size in layouts:
+        filepath = os.path.join(output_dir, f"{name}.h5")
+        if os.path.isfile(filepath):
+            os.remove(filepath)
+        results = benchmark_layout(filepath, timesteps, chunk_size=chunk_size, flush_size=flush_size)
+        print(
+            f"    {name:<12} wall time: {results['wall_time_s']:.3f}s | "
+            f"bytes written: {results['bytes_written'] / 1e6:.2f}MB | file size: {results['file_size'] / 1e6:.2f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+benchmark_trajectory_reader.py
+
+Builds a synthetic data tree (`trajectory.h5` files plus side-by-side stereo MP4 recordings, optionally with videos
+embedded in the HDF5 files) and separately times `TrajectoryReader`, `load_trajectory`, `RecordedMultiCameraWrapper`
+and `TrajectorySampler.fetch_samples` on it. Each benchmark breaks its time down by stage (HDF5 reads, video decode,
+resize, colour conversion, other image transforms, and `TimestepProcesser`), and results are saved as JSON.
+
+Stage times are exclusive (a stage's time excludes the stages it calls). Decoding done ahead in background threads is
+counted under video decode as well, so stage times can add up to more than the wall time. Colour conversion only
+counts explicit `cv2.cvtColor` calls (e.g. the BGR to RGB transform): the YUV to BGR conversion that
+`cv2.VideoCapture` and PyAV do while decoding happens inside the decoder, so it is counted under video decode.
+
+Run from DROID directory root with: `python scripts/benchmarks/benchmark_trajectory_reader.py --num_trajectories 4`
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import cv2
+import pyrallis
+
+from droid.camera_utils.info import camera_type_to_string_dict
+from droid.camera_utils.recording_readers.mp4_reader import MP4Reader
+from droid.camera_utils.wrappers.recorded_multi_camera_wrapper import RecordedMultiCameraWrapper
+from droid.data_loading.trajectory_sampler import TrajectorySampler
+from droid.data_processing.data_transforms import ImageTransformer
+from droid.data_processing.timestep_processing import TimestepProcesser
+from droid.trajectory_utils.hdf5_video import HDF5VideoReader
+from droid.trajectory_utils.misc import load_trajectory
+from droid.trajectory_utils.synthetic_data import generate_data_tree
+from droid.trajectory_utils.trajectory_reader import TrajectoryReader
+
+# Methods To Time, As (Owner, Method Name, Stage). Owners Can Be Modules, Whose Functions Are Looked Up On Call #
+PROFILED_METHODS = [
+    (TrajectoryReader, "__init__", "hdf5_open"),
+    (TrajectoryReader, "read_timestep", "hdf5_read"),
+    (TrajectoryReader, "read_columns", "hdf5_read"),
+    (HDF5VideoReader, "__init__", "video_open"),
+    (HDF5VideoReader, "read_frame", "video_decode"),
+    (HDF5VideoReader, "_decode_frame", "video_decode"),
+    (MP4Reader, "__init__", "video_open"),
+    (MP4Reader, "set_frame_index", "video_seek"),
+    (MP4Reader, "read_camera", "video_decode"),
+    (MP4Reader, "_process_frame", "resize"),
+    (cv2, "cvtColor", "colour_conversion"),
+    (ImageTransformer, "forward", "image_transform"),
+    (TimestepProcesser, "forward", "timestep_processing"),
+]
+
+
+@dataclass
+class ReaderBenchmarkConfig:
+    # fmt: off
+    data_dir: Optional[str] = None                          # Where to build the synthetic data (defaults to a temp dir)
+    num_trajectories: int = 4                               # Number of synthetic episodes
+    num_steps: int = 150                                    # Number of timesteps per episode
+    num_cameras: int = 3                                    # Number of (stereo) cameras per episode
+    image_height: int = 180                                 # Height of each recorded image
+    image_width: int = 320                                  # Width of each recorded image
+    save_hdf5_videos: bool = True                           # Whether to also embed videos in the HDF5 files
+    resolution: Tuple[int, int] = (128, 128)                # Resolution recorded images are resized to
+    num_samples_per_traj: int = 50                          # Samples taken per trajectory by the sampler
+    num_fetches: int = 4                                    # Number of TrajectorySampler.fetch_samples calls
+    benchmarks: List[str] = ("trajectory_reader", "load_trajectory", "recorded_cameras", "trajectory_sampler")
+    results_path: str = "reader_benchmark.json"             # Where to save the JSON results
+
+    # fmt: on
+
+
+class StageProfiler:
+    """Wraps methods to accumulate the exclusive time spent in each stage, per thread-safe call stack."""
+
+    def __init__(self):
+        self.stage_times = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._patches = []
+
+    def _wrap(self, method, stage):
+        def timed_method(*args, **kwargs):
+            stack = self._local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                child_time = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.stage_times[stage] += elapsed - child_time
+                    self.stage_calls[stage] += 1
+
+        return timed_method
+
+    @contextmanager
+    def profile(self, profiled_methods):
+        for owner, name, stage in profiled_methods:
+            method = getattr(owner, name)
+            self._patches.append((owner, name, method))
+            setattr(owner, name, self._wrap(method, stage))
+        try:
+            yield self
+        finally:
+            for owner, name, method in reversed(self._patches):
+                setattr(owner, name, method)
+            self._patches = []
+
+    def get_results(self, wall_time):
+        stages = {
+            stage: {"time_s": self.stage_times[stage], "calls": self.stage_calls[stage]} for stage in self.stage_times
+        }
+        stages["other"] = {"time_s": max(wall_time - sum(self.stage_times.values()), 0), "calls": 0}
+        return stages
+
+
+def get_camera_kwargs(cfg):
+    reading_kwargs = dict(image=True, concatenate_images=False, resolution=cfg.resolution, resize_func="cv2")
+    return {cam_type: dict(reading_kwargs) for cam_type in camera_type_to_string_dict.values()}
+
+
+def benchmark_trajectory_reader(folderpaths, cfg):
+    num_steps = 0
+    for folderpath in folderpaths:
+        traj_reader = TrajectoryReader(os.path.join(folderpath, "trajectory.h5"), read_images=cfg.save_hdf5_videos)
+        for _ in range(traj_reader.length()):
+            traj_reader.read_timestep()
+        traj_reader.read_columns()
+        num_steps += traj_reader.length()
+        traj_reader.close()
+    return num_steps
+
+
+def benchmark_load_trajectory(folderpaths, cfg):
+    num_steps = 0
+    for folderpath in folderpaths:
+        traj = load_trajectory(
+            os.path.join(folderpath, "trajectory.h5"),
+            recording_folderpath=os.path.join(folderpath, "recordings", "MP4"),
+            camera_kwargs=get_camera_kwargs(cfg),
+        )
+        num_steps += len(traj)
+    return num_steps
+
+
+def benchmark_recorded_cameras(folderpaths, cfg):
+    num_steps = 0
+    for folderpath in folderpaths:
+        traj_reader = TrajectoryReader(os.path.join(folderpath, "trajectory.h5"), read_images=False)
+        camera_reader = RecordedMultiCameraWrapper(os.path.join(folderpath, "recordings", "MP4"), get_camera_kwargs(cfg))
+        for timestep in traj_reader.iter_timesteps(keys=["observation/camera_type", "observation/timestamp/cameras"]):
+            camera_type_dict = {
+                k: camera_type_to_string_dict[v] for k, v in timestep["observation"]["camera_type"].items()
+            }
+            timestamp_dict = timestep["observation"]["timestamp"]["cameras"]
+            camera_reader.read_cameras(camera_type_dict=camera_type_dict, timestamp_dict=timestamp_dict)
+            num_steps += 1
+        camera_reader.disable_cameras()
+        traj_reader.close()
+    return num_steps
+
+
+def benchmark_trajectory_sampler(folderpaths, cfg):
+    traj_sampler = TrajectorySampler(
+        folderpaths,
+        recording_prefix="MP4",
+        traj_loading_kwargs=dict(remove_skipped_steps=True, num_samples_per_traj=cfg.num_samples_per_traj),
+        timestep_filtering_kwargs=dict(gripper_action_space="velocity"),
+        image_transform_kwargs=dict(remove_alpha=True, bgr_to_rgb=True, to_tensor=True),
+        camera_kwargs=get_camera_kwargs(cfg),
+    )
+    return sum([len(traj_sampler.fetch_samples()) for _ in range(cfg.num_fetches)])
+
+
+BENCHMARKS = {
+    "trajectory_reader": benchmark_trajectory_reader,
+    "load_trajectory": benchmark_load_trajectory,
+    "recorded_cameras": benchmark_recorded_cameras,
+    "trajectory_sampler": benchmark_trajectory_sampler,
+}
+
+
+@pyrallis.wrap()
+def main(cfg: ReaderBenchmarkConfig) -> None:
+    data_dir = cfg.data_dir if cfg.data_dir is not None else tempfile.mkdtemp()
+    results = {"config": {k: list(v) if isinstance(v, tuple) else v for k, v in vars(cfg).items()}, "benchmarks": {}}
+
+    print(f"[*] Building {cfg.num_trajectories} synthetic episodes in `{data_dir}`")
+    folderpaths = generate_data_tree(
+        data_dir,
+        num_trajectories=cfg.num_trajectories,
+        num_steps=cfg.num_steps,
+        num_cameras=cfg.num_cameras,
+        image_shape=(cfg.image_height, cfg.image_width, 3),
+        save_hdf5_videos=cfg.save_hdf5_videos,
+    )
+
+    for name in cfg.benchmarks:
+        profiler = StageProfiler()
+        with profiler.profile(PROFILED_METHODS):
+            start_time = time.time()
+            num_steps = BENCHMARKS[name](folderpaths, cfg)
+            wall_time = time.time() - start_time
+
+        stages = profiler.get_results(wall_time)
+        results["benchmarks"][name] = {
+            "wall_time_s": wall_time,
+            "num_steps": num_steps,
+            "steps_per_s": num_steps / wall_time,
+            "stages": stages,
+        }
+
+        print(f"    {name:<20} {num_steps} steps in {wall_time:.2f}s ({num_steps / wall_time:.1f} steps/s)")
+        for stage, stage_results in sorted(stages.items(), key=lambda item: -item[1]["time_s"]):
+            if stage_results["time_s"] > 0:
+                print(f"        {stage:<20} {stage_results['time_s']:.3f}s ({stage_results['calls']} calls)")
+
+    with open(cfg.results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[*] Saved results to `{cfg.results_path}`")
+
+
+if __name__ == "__main__":
+    main()
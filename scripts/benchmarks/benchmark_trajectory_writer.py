@@ -0,0 +1,154 @@
+"""
+benchmark_trajectory_writer.py
+
+Drives `TrajectoryWriter` with synthetic timesteps at a target control frequency (no robot or cameras required), and
+reports sustained throughput, `write_timestep` latency percentiles, writer queue lag, peak RSS, and bytes on disk for
+each writer mode. Results are saved as JSON, so runs can be compared to catch regressions.
+
+Run from DROID directory root with: `python scripts/benchmarks/benchmark_trajectory_writer.py --control_hz 15`
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import h5py
+import numpy as np
+import psutil
+import pyrallis
+
+from droid.trajectory_utils.synthetic_data import generate_timestep
+from droid.trajectory_utils.trajectory_reader import read_trajectory_attrs
+from droid.trajectory_utils.trajectory_writer import TrajectoryWriter
+
+# Keyword Arguments To TrajectoryWriter For Each Writer Mode (See benchmark_hdf5_layout.py For The Legacy Layout) #
+WRITER_MODES = {
+    "unchunked": {},
+    "chunked": {"chunk_size": 256},
+    "buffered": {"chunk_size": 256, "flush_size": 64},
+    "buffered_lzf": {"chunk_size": 256, "flush_size": 64, "compression_profile": "lzf"},
+    "journal": {"chunk_size": 256, "journal": True},
+    "drop_oldest": {"chunk_size": 256, "flush_size": 64, "video_queue_policy": "drop_oldest"},
+    "swmr": {"chunk_size": 256, "flush_size": 16, "flush_interval": 1.0, "swmr": True},
+}
+
+
+@dataclass
+class WriterBenchmarkConfig:
+    # fmt: off
+    num_steps: int = 300                                    # Number of timesteps per trajectory
+    control_hz: float = 15                                  # Rate to write timesteps at (0 writes as fast as possible)
+    writer_modes: List[str] = ("unchunked", "chunked", "buffered", "journal")  # Keys of WRITER_MODES to benchmark
+    num_cameras: int = 3                                    # Number of (stereo) cameras in the synthetic timesteps
+    save_images: bool = True                                # Whether to include (and encode) camera images
+    image_height: int = 180                                 # Height of the synthetic images
+    image_width: int = 320                                  # Width of the synthetic images
+    image_channels: int = 4                                 # Channels of the synthetic images (the ZED returns BGRA)
+    output_dir: Optional[str] = None                        # Where to write trajectories (defaults to a temp dir)
+    results_path: str = "writer_benchmark.json"             # Where to save the JSON results
+
+    # fmt: on
+
+
+class PeakRSSMonitor:
+    """Samples the resident set size of this process in a background thread, and tracks its peak."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_rss = 0
+        self._process = psutil.Process()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._monitor, daemon=True)
+
+    def _monitor(self):
+        while not self._stop_event.is_set():
+            self.peak_rss = max(self.peak_rss, self._process.memory_info().rss)
+            self._stop_event.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop_event.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, self._process.memory_info().rss)
+
+
+def benchmark_writer(filepath, writer_kwargs, cfg):
+    image_shape = (cfg.image_height, cfg.image_width, cfg.image_channels) if cfg.save_images else None
+    rng = np.random.default_rng(0)
+    step_period = (1 / cfg.control_hz) if (cfg.control_hz > 0) else 0
+    latencies = []
+
+    with PeakRSSMonitor() as rss_monitor:
+        start_rss = psutil.Process().memory_info().rss
+        start_time = time.time()
+        traj_writer = TrajectoryWriter(filepath, save_images=cfg.save_images, **writer_kwargs)
+
+        for i in range(cfg.num_steps):
+            # Generate Timestep (Excluded From Latency) #
+            timestep = generate_timestep(i, cfg.num_cameras, image_shape=image_shape, rng=rng)
+
+            # Time Write #
+            write_start = time.perf_counter()
+            traj_writer.write_timestep(timestep)
+            latencies.append(time.perf_counter() - write_start)
+
+            # Hold Control Frequency #
+            sleep_left = start_time + (i + 1) * step_period - time.time()
+            if sleep_left > 0:
+                time.sleep(sleep_left)
+
+        close_start = time.time()
+        traj_writer.close()
+        end_time = time.time()
+
+    with h5py.File(filepath, "r") as hdf5_file:
+        writer_stats = json.loads(read_trajectory_attrs(hdf5_file).get("writer_stats", "{}"))
+
+    latencies_ms = 1000 * np.array(latencies)
+    return {
+        "steps_per_s": cfg.num_steps / (end_time - start_time),
+        "write_latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "write_latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "write_latency_max_ms": float(latencies_ms.max()),
+        "close_time_s": end_time - close_start,
+        "max_queue_lag_ms": max([stats["max_lag_ms"] for stats in writer_stats.values()], default=0),
+        "num_dropped_frames": sum([stats["num_dropped"] for stats in writer_stats.values()]),
+        "peak_rss_mb": rss_monitor.peak_rss / 1e6,
+        "peak_rss_increase_mb": (rss_monitor.peak_rss - start_rss) / 1e6,
+        "file_size_mb": os.path.getsize(filepath) / 1e6,
+        "writer_stats": writer_stats,
+    }
+
+
+@pyrallis.wrap()
+def main(cfg: WriterBenchmarkConfig) -> None:
+    output_dir = cfg.output_dir if cfg.output_dir is not None else tempfile.mkdtemp()
+    results = {"config": {k: list(v) if isinstance(v, tuple) else v for k, v in vars(cfg).items()}, "modes": {}}
+
+    print(f"[*] Writing {cfg.num_steps} synthetic timesteps at {cfg.control_hz} Hz to `{output_dir}`")
+    for mode in cfg.writer_modes:
+        filepath = os.path.join(output_dir, f"{mode}.h5")
+        if os.path.isfile(filepath):
+            os.remove(filepath)
+        mode_results = benchmark_writer(filepath, WRITER_MODES[mode], cfg)
+        results["modes"][mode] = dict(mode_results, writer_kwargs=WRITER_MODES[mode])
+        print(
+            f"    {mode:<12} {mode_results['steps_per_s']:.1f} steps/s | "
+            f"write p50/p99: {mode_results['write_latency_p50_ms']:.2f}/{mode_results['write_latency_p99_ms']:.2f}ms | "
+            f"queue lag: {mode_results['max_queue_lag_ms']:.1f}ms | peak RSS: {mode_results['peak_rss_mb']:.0f}MB | "
+            f"file size: {mode_results['file_size_mb']:.2f}MB"
+        )
+
+    with open(cfg.results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[*] Saved results to `{cfg.results_path}`")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+recover_trajectories.py
+
+Rebuilds `trajectory.h5` files from the write-ahead journals (`trajectory.h5.journal`) left behind when a collection
+process died mid-episode. Only trajectories written with `TrajectoryWriter(journal=True)` can be recovered, and embedded
+videos are not recovered.
+
+Run from DROID directory root with: `python scripts/convert/recover_trajectories.py --data_dir <DATA_DIR>`
+"""
+from dataclasses import dataclass
+from pathlib import Path
+
+import pyrallis
+
+from droid.trajectory_utils.trajectory_journal import JOURNAL_SUFFIX
+from droid.trajectory_utils.trajectory_writer import recover_trajectory
+
+
+@dataclass
+class RecoveryConfig:
+    # fmt: off
+    data_dir: Path = Path("data")                           # Directory to search (recursively) for trajectory journals
+    compression_profile: str = "none"                       # Compression profile for the rebuilt HDF5 files
+    dry_run: bool = False                                   # Only list the journals that would be recovered
+
+    # fmt: on
+
+
+@pyrallis.wrap()
+def main(cfg: RecoveryConfig) -> None:
+    journal_filepaths = sorted(cfg.data_dir.rglob("*.h5" + JOURNAL_SUFFIX))
+    print(f"[*] Found {len(journal_filepaths)} trajectory journals in `{cfg.data_dir}`")
+
+    for journal_filepath in journal_filepaths:
+        if cfg.dry_run:
+            print(f"    {journal_filepath}")
+            continue
+
+        try:
+            num_steps = recover_trajectory(str(journal_filepath), compression_profile=cfg.compression_profile)
+        except ValueError as e:
+            print(f"    [Skipped] {journal_filepath} :: {e}")
+            continue
+
+        journal_filepath.unlink()
+        print(f"    [Recovered] {journal_filepath} :: {num_steps} timesteps")
+
+
+if __name__ == "__main__":
+    main()
@@ -148,10 +148,8 @@ def create_tfrecord(paths, output_path, tqdm_func, global_tqdm):
         h5_filepath = os.path.join(path, "trajectory.h5")
         recording_folderpath = os.path.join(path, "recordings", "MP4")
 
-        # this is really inefficient, should really do frame skipping inside `load_trajectory` but I didn't want to mess
-        # with it for now
-        traj = load_trajectory(h5_filepath, recording_folderpath=recording_folderpath)
-        traj = traj[::FRAMESKIP]
+        # frame skipping happens inside `load_trajectory`, so skipped frames are never decoded
+        traj = load_trajectory(h5_filepath, recording_folderpath=recording_folderpath, stride=FRAMESKIP)
 
         # each element of `traj` is a possibly nested dict; flatten them and make sure they all have the same keys
         traj_flat = [flatten(t) for t in traj]
@@ -0,0 +1,50 @@
+import copy
+from types import SimpleNamespace
+
+import numpy as np
+
+from droid.data_loading.trajectory_sampler import TrajectorySampler
+
+NUM_TRAJS, WORLD_SIZE, NUM_WORKERS = 20, 2, 2
+epoch_length = NUM_TRAJS // (WORLD_SIZE * NUM_WORKERS)
+all_folderpaths = ["trajectory_{0}".format(i) for i in range(NUM_TRAJS)]
+
+
+def read_epochs(sampler, num_epochs):
+    """Returns the trajectories each worker of each rank reads per epoch, from copies of the sampler (as DataLoader)."""
+    epochs = [[] for _ in range(num_epochs)]
+    for rank in range(WORLD_SIZE):
+        for worker_id in range(NUM_WORKERS):
+            worker_sampler = copy.deepcopy(sampler)
+            worker_sampler.rank, worker_sampler.world_size = rank, WORLD_SIZE
+            worker_info = SimpleNamespace(num_workers=NUM_WORKERS, id=worker_id)
+            traj_inds = [worker_sampler._sample_trajectory(worker_info) for _ in range(num_epochs * epoch_length)]
+            for epoch in range(num_epochs):
+                epochs[epoch].append(traj_inds[epoch * epoch_length : (epoch + 1) * epoch_length])
+    return epochs
+
+
+def assert_disjoint_and_complete(shards):
+    traj_inds = np.concatenate(shards)
+    assert len(traj_inds) == NUM_TRAJS, traj_inds
+    assert sorted(traj_inds) == list(range(NUM_TRAJS)), shards
+
+
+# Workers Move On To The Next Epoch Together #
+sampler = TrajectorySampler(all_folderpaths, seed=3)
+epochs = read_epochs(sampler, num_epochs=2)
+for shards in epochs:
+    assert_disjoint_and_complete(shards)
+assert epochs[0] != epochs[1]
+
+# Setting The Epoch In The Main Process Reaches Every Worker Copy #
+sampler.set_epoch(1)
+assert read_epochs(sampler, num_epochs=1)[0] == epochs[1]
+
+# Weights Are Applied Before Sharding, So Together The Shards Follow Them #
+traj_weights = np.repeat([0, 1, 3], [4, 8, 8])
+sampler = TrajectorySampler(all_folderpaths, traj_weights=traj_weights, seed=3)
+traj_inds = np.concatenate([np.concatenate(shards) for shards in read_epochs(sampler, num_epochs=200)])
+assert np.all(traj_weights[traj_inds] > 0)
+assert abs(np.mean(traj_weights[traj_inds] == 3) - 0.75) < 0.02
+print("Shards cover every trajectory once per epoch across {0} ranks x {1} workers".format(WORLD_SIZE, NUM_WORKERS))
@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+import h5py
+
+from droid.trajectory_utils.synthetic_data import generate_timestep
+from droid.trajectory_utils.trajectory_reader import read_trajectory_attrs
+from droid.trajectory_utils.trajectory_writer import TrajectoryWriter
+
+# Write An SWMR Trajectory, Saving Its Label On Close #
+filepath = os.path.join(tempfile.mkdtemp(), "trajectory.h5")
+traj_writer = TrajectoryWriter(filepath, metadata={"user": "synthetic"}, swmr=True, save_images=False)
+for i in range(10):
+    traj_writer.write_timestep(generate_timestep(i, num_cameras=1))
+traj_writer.close(metadata={"success": True, "failure": False})
+
+with h5py.File(filepath, "r") as hdf5_file:
+    attrs = read_trajectory_attrs(hdf5_file)
+assert attrs["success"] and (not attrs["failure"]) and (attrs["user"] == "synthetic")
+
+# Relabel After Close, Like DataCollecter.change_trajectory_status #
+with h5py.File(filepath, "r+") as hdf5_file:
+    hdf5_file.attrs["success"] = False
+    hdf5_file.attrs["failure"] = True
+
+with h5py.File(filepath, "r") as hdf5_file:
+    attrs = read_trajectory_attrs(hdf5_file)
+assert (not attrs["success"]) and attrs["failure"], attrs
+print("Relabelled SWMR trajectory reads back as a failure")